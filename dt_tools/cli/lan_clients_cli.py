@@ -14,19 +14,64 @@ Default approach is ARP cache, however Broadcast (-b parameter) is more thorough
     - MAC Address
     - MAC Vendor
   - Uses ARP Cache or ARP Broadcast to identify clients
-  - Can output results into a pipe '|' delimited file 
+  - Linux ARP cache read directly from the kernel (netlink, or /proc/net/arp), no arp command
+  - Watch mode, clients displayed as they join/leave the neighbour table (netlink events)
+  - Linux ARP broadcast sent from raw sockets at a paced rate, one shard per interface and a single
+    receive loop, so large networks (i.e. /16) can be swept
+  - Hostnames and vendors are resolved concurrently, each lookup bounded by a deadline
+  - Streaming mode, clients are displayed as ARP replies arrive and updated as they resolve
+  - Hostnames cached (~/.IpHelper/LanClientHostnames.json) by MAC and IP, failed lookups for a shorter time
+  - Offline vendor (OUI) database (~/.IpHelper/oui.idx) built from the IEEE registry, no online vendor lookups
+  - Online vendor lookups cached (~/.IpHelper/LanClientVendors.json) by MAC and paced to the API rate limit
+  - Diff mode, clients that joined, left or changed (IP, hostname, MAC) since the last run (snapshot),
+    only new/changed clients are resolved
+  - Clients kept in a compact table (integer IP/MAC columns), O(1) lookup and multi-key sorts
+  - Can output results into a pipe '|' delimited, CSV or NDJSON file (or stdout), rows written as resolved
+  - Python API, discover_clients() generates LAN_Client entries (no console output)
 
 **Usage**:
 
-  lan-clients [-h] [-o filename] [-b] [-v]
+  lan-clients [-h] [-o filename] [-f {pipe,csv,ndjson}] [-b] [--network cidr ...] [--interface name ...]
+              [--rate pps] [-s key[,key...]] [--stream] [-d] [--snapshot filename] [-W] [-w secs] [-r]
+              [--cache_ttl secs] [--negative_ttl secs] [--refresh_oui [csv ...]] [-v]
 
   Parameters:
 
   - -h help
-  - -o filename: output file for pipe '|' delimited output data.
+  - -o filename: output file, each row is written (flushed) as the client is resolved, '-' for stdout
+    (console output then goes to stderr).
+  - -f format: output file format, pipe '|' delimited, csv or ndjson (default pipe)
   - -b Use Broadcast ARP ping (insteac of ARP cache) to identify clients.
+  - --network cidr ...: Networks to ARP broadcast (implies -b, default the /24 of each interface's address,
+    networks wider than /24 are only swept when given explicitly)
+  - --interface name ...: Interfaces to ARP broadcast from (implies -b, default the default route interface)
+  - --rate pps: ARP broadcast requests per second, per interface (default 1000)
+  - -s key[,key...]: Sort keys ip, hostname, mac or vendor, compound keys comma separated (i.e. vendor,ip)
+  - --stream Display clients as they are found (rows updated in place as resolved), then a sorted summary.
+  - -d Diff mode, report clients that joined/left/changed since the last -d run (snapshot), the
+    snapshot is updated.  Clients are resolved only if new or their IP changed (-r resolves all), the
+    hostname of known clients is re-checked once its cache entry expires (--cache_ttl).
+  - --snapshot filename: Diff mode snapshot file (default ~/.IpHelper/LanClientSnapshot.json)
+  - -W Watch the neighbour (ARP) table, clients are displayed as they join/leave until Ctrl-C (Linux).
+  - -w secs: Seconds to wait for each client's hostname/vendor lookups (default 3.0)
+  - -r Re-resolve all hostnames, ignoring the hostname cache.
+  - --cache_ttl secs: Seconds a resolved hostname is cached (default 86400)
+  - --negative_ttl secs: Seconds a failed hostname lookup is cached (default 3600)
+  - --refresh_oui [csv ...]: Rebuild the offline vendor database from IEEE registry CSV files/URLs
+    (default: download the MA-L, MA-M and MA-S registries from the IEEE site)
   - -v Verbose logging
 
+**Python API**::
+
+    from dt_tools.cli.lan_clients_cli import ClientTable, SORT_KEY, discover_clients
+
+    for client in discover_clients(load_via_broadcast=True):
+        print(client.ip, client.hostname, client.mac, client.vendor)
+
+    table = ClientTable(discover_clients())
+    table.get('192.168.1.1'), table.by_mac('XX:XX:XX:XX:XX:XX')
+    table.sorted([SORT_KEY.VENDOR, SORT_KEY.IP])
+
 **Note**::
 
     For devices that are only identified by their IP and MAC address (ie. hostname not resolvable),
@@ -51,15 +96,41 @@ Default approach is ARP cache, however Broadcast (-b parameter) is more thorough
 
     int: number of client devices identified on LAN.
 
+    In diff (-d) mode:
+
+    - 0       no changes since last run (or snapshot created)
+    - 1-999   the number of clients that joined, left or changed
+
 """
+import abc
 import argparse
+import array
+import bisect
+import concurrent.futures
+import contextlib
+import csv
+import datetime
+import functools
+import io
+import ipaddress
+import json
+import mmap
+import os
 import pathlib
 import queue
+import selectors
 import signal
+import socket
+import struct
 import sys
 import threading
 import time
+import urllib.request
+from dataclasses import dataclass, field
 from enum import Enum
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Sized, TextIO, Tuple
+
+import scapy.all as scapy
 
 import dt_tools.logger.logging_helper as lh
 import dt_tools.net.net_helper as net_helper
@@ -67,14 +138,36 @@ from dt_tools.console.console_helper import ColorFG
 from dt_tools.console.console_helper import ConsoleHelper as console
 from dt_tools.console.console_helper import TextStyle
 from dt_tools.console.spinner import Spinner
+from dt_tools.net.ip_info_helper import MAC_INFO_LOCATION
 from dt_tools.net.net_helper import LAN_Client
+from dt_tools.os.os_helper import OSHelper
 from dt_tools.os.project_helper import ProjectHelper
 from loguru import logger as LOGGER
 
-ip_queue = queue.Queue()
-resolved_queue = queue.SimpleQueue()
 stop_event = threading.Event()
 
+HOSTNAME_CACHE_LOCATION = MAC_INFO_LOCATION.parent / "LanClientHostnames.json"
+VENDOR_CACHE_LOCATION = MAC_INFO_LOCATION.parent / "LanClientVendors.json"
+OUI_DB_LOCATION = MAC_INFO_LOCATION.parent / "oui.idx"
+SNAPSHOT_LOCATION = MAC_INFO_LOCATION.parent / "LanClientSnapshot.json"
+# IEEE registry CSV files, MA-L (24 bit), MA-M (28 bit) and MA-S (36 bit) assignments
+OUI_CSV_URLS = [
+    'https://standards-oui.ieee.org/oui/oui.csv',
+    'https://standards-oui.ieee.org/oui28/mam.csv',
+    'https://standards-oui.ieee.org/oui36/oui36.csv',
+]
+
+_MAX_THREADS = 30
+_HOSTNAME_TTL = 24 * 3600        # Seconds a resolved hostname is cached
+_HOSTNAME_NEGATIVE_TTL = 3600    # Seconds a failed (or timed out) hostname lookup is cached
+_VENDOR_TTL = 30 * 24 * 3600     # Seconds an online vendor lookup is cached
+_VENDOR_INTERVAL = 0.5           # Seconds between online vendor lookups (api.macvendors.com allows ~2/sec)
+_LOOKUP_WAIT = 3.0  # Seconds to wait for a client's hostname and vendor lookups
+_SWEEP_WAIT = 3.0   # Seconds to wait for ARP broadcast replies
+_SWEEP_RATE = 1000.0     # ARP requests per second, per interface
+_SWEEP_REPLY_WAIT = 1.0  # Seconds to wait for ARP replies after the last request
+_SWEEP_DEFAULT_PREFIX = 24  # Default sweep is bounded to the /24 of the interface address (wider networks must be given)
+
 class SORT_KEY(Enum):
     IP = 1
     HOSTNAME = 2
@@ -82,135 +175,1406 @@ class SORT_KEY(Enum):
     VENDOR = 4
 
 def sort_by_ip(entry: LAN_Client):
-    ip_tokens = entry.ip.split('.')
-    sort_ip=''
-    for t in ip_tokens:
-        sort_ip += f'{int(t):3d}.'
-    return sort_ip
+    return ClientTable.ip_value(entry.ip)
 
 def sort_by_hostname(entry: LAN_Client):
-    return entry.hostname
+    return entry.hostname or ''
 
 def sort_by_mac(entry: LAN_Client):
-    return entry.mac
+    return entry.mac or ''
 
 def sort_by_vendor(entry: LAN_Client):
-    return entry.vendor
+    return entry.vendor or ''
 
-def _build_queue(load_via_broadcast: bool = False, sort_key: SORT_KEY = SORT_KEY.IP) -> int:
-    # Retrieve clients based on ARP cache
-    spinner = Spinner('Searching', show_elapsed=True)
-    if load_via_broadcast:
-        search_type = "ARP Broadcast"
-        search_display = console.cwrap(search_type, fg=ColorFG.DEFAULT, style=TextStyle.ITALIC)
-        spinner.start_spinner(f'searching for clients via {search_display}')
-        client_list = net_helper.get_lan_clients_ARP_broadcast(include_hostname=True, include_mac_vendor=True)
-    else:
-        search_type = "ARP Cache"
-        search_display = console.cwrap(search_type, fg=ColorFG.DEFAULT, style=TextStyle.ITALIC)
-        spinner.start_spinner(f'searching for clients via {search_display}')
-        client_list = net_helper.get_lan_clients_from_ARP_cache(include_hostname=True, include_mac_vendor=True)
+class ClientTable():
+    """
+    Compact client table, one row per IP address.  Columns are parallel arrays, IP (IPv4 or
+    IPv6) and MAC as integers, hostname and vendor as strings ('' when unknown).  Clients
+    are looked up by IP or MAC in O(1), and sorted by ordering row numbers on the column
+    values, so no per-client sort key is built.
 
-    LOGGER.debug(f'{len(client_list)} clients retrieved.')
-    if sort_key == SORT_KEY.IP:
-        client_list.sort(key=sort_by_ip)
-    elif sort_key == SORT_KEY.HOSTNAME:
-        client_list.sort(key=sort_by_hostname)
-    elif sort_key == SORT_KEY.MAC:
-        client_list.sort(key=sort_by_mac)
-    elif sort_key == SORT_KEY.VENDOR:
-        client_list.sort(key=sort_by_vendor)
+    LAN_Client entries are only created when clients are retrieved.
+    """
+    __slots__ = ('_ips', '_macs', '_hostnames', '_vendors', '_ip_rows', '_mac_rows')
+    _NO_MAC = 1 << 48  # Unknown MAC, sorted after all MACs
+
+    def __init__(self, clients: Iterable[LAN_Client] = ()):
+        self._ips: List[int] = []
+        self._macs = array.array('Q')
+        self._hostnames: List[str] = []
+        self._vendors: List[str] = []
+        self._ip_rows: Dict[int, int] = {}
+        self._mac_rows: Dict[int, List[int]] = {} # A MAC may answer for several IPs (i.e. a router)
+        for client in clients:
+            self.add(client)
+
+    def __len__(self) -> int:
+        return len(self._ips)
+
+    def __iter__(self) -> Iterator[LAN_Client]:
+        return map(self.client, range(len(self._ips)))
+
+    def __contains__(self, ip: str) -> bool:
+        return self.ip_value(ip) in self._ip_rows
+
+    @staticmethod
+    def ip_value(ip: str) -> int:
+        return int(ipaddress.ip_address(ip))
+
+    @classmethod
+    def mac_value(cls, mac: str) -> int:
+        if not mac:
+            return cls._NO_MAC
+        return int(mac.replace(':', '').replace('-', ''), 16)
+
+    def add(self, client: LAN_Client) -> int:
+        """Add the client, or update the row of its IP.  Returns the row number."""
+        ip = self.ip_value(client.ip)
+        mac = self.mac_value(client.mac)
+        row = self._ip_rows.get(ip)
+        if row is None:
+            row = len(self._ips)
+            self._ip_rows[ip] = row
+            self._ips.append(ip)
+            self._macs.append(mac)
+            self._hostnames.append(client.hostname or '')
+            self._vendors.append(client.vendor or '')
+        else:
+            if self._macs[row] != mac:
+                self._mac_rows[self._macs[row]].remove(row)
+                self._macs[row] = mac
+            self._hostnames[row] = client.hostname or ''
+            self._vendors[row] = client.vendor or ''
+        rows = self._mac_rows.setdefault(mac, [])
+        if row not in rows:
+            rows.append(row)
+        return row
+
+    def row(self, ip: str) -> int:
+        """Row number of the IP, None if not in the table."""
+        return self._ip_rows.get(self.ip_value(ip))
+
+    def client(self, row: int) -> LAN_Client:
+        mac = self._macs[row]
+        mac = None if mac == self._NO_MAC else ':'.join([f'{mac:012X}'[idx:idx + 2] for idx in range(0, 12, 2)])
+        return LAN_Client(str(ipaddress.ip_address(self._ips[row])), mac,
+                          self._hostnames[row] or None, self._vendors[row] or None)
+
+    def get(self, ip: str) -> LAN_Client:
+        """Client with the IP, None if not in the table."""
+        row = self.row(ip)
+        return None if row is None else self.client(row)
+
+    def by_mac(self, mac: str) -> List[LAN_Client]:
+        """Clients (IPs) with the MAC."""
+        return [self.client(row) for row in self._mac_rows.get(self.mac_value(mac), [])]
+
+    def sorted(self, sort_keys: List['SORT_KEY'] = None) -> List[LAN_Client]:
+        """
+        Clients ordered by one or more sort keys (default ip), the first key is the most significant.
+        """
+        columns = {
+            SORT_KEY.IP: self._ips,
+            SORT_KEY.HOSTNAME: self._hostnames,
+            SORT_KEY.MAC: self._macs,
+            SORT_KEY.VENDOR: self._vendors,
+        }
+        rows = list(range(len(self._ips)))
+        # Stable sorts, least significant key first
+        for sort_key in reversed(sort_keys or [SORT_KEY.IP]):
+            rows.sort(key=columns[sort_key].__getitem__)
+        return [self.client(row) for row in rows]
+
+def _sort_keys(value: str) -> List[SORT_KEY]:
+    """Comma separated sort keys (i.e. vendor,ip) argument."""
+    try:
+        return [SORT_KEY[token.strip().upper()] for token in value.split(',')]
+    except KeyError as ex:
+        choices = ','.join([key.name.lower() for key in SORT_KEY])
+        raise argparse.ArgumentTypeError(f'invalid sort key {ex} (choose from {choices})')
+
+@dataclass
+class SweepOptions():
+    networks: List[str] = None       # CIDR networks to sweep (None = /24 (or smaller) connected network of each interface)
+    interfaces: List[str] = None     # Interfaces to sweep from (None = default route interface, all if networks given)
+    rate: float = _SWEEP_RATE        # ARP requests per second, per interface
+    reply_wait: float = _SWEEP_REPLY_WAIT  # Seconds to wait for replies after the last request
+
+def discover_clients(load_via_broadcast: bool = False, lookup_wait: float = _LOOKUP_WAIT,
+                     use_cache: bool = True, sweep_options: SweepOptions = None) -> Iterator[LAN_Client]:
+    """
+    Identify clients on the local network (no console output).
+
+    Keyword Arguments:
+        load_via_broadcast: Use ARP broadcast (vs ARP cache) to identify clients (default False).
+        lookup_wait: Seconds to wait for each client's hostname and vendor lookups (default 3.0).
+        use_cache: Use (and update) the persistent hostname cache (default True).
+        sweep_options: Networks, interfaces and rate of the ARP broadcast sweep (default
+            /24 connected network of the default route interface, 1000 requests per second).
+
+    Returns:
+        Iterator of LAN_Client (ip, hostname, mac, vendor), generated as each client is
+        resolved.  Fields that could not be resolved within lookup_wait are None.
+    """
+    hostname_cache = _HostnameCache() if use_cache else None
+    try:
+        clients = _discover_clients(load_via_broadcast, sweep_options)
+        yield from _resolve_clients(clients, lookup_wait, hostname_cache=hostname_cache)
+    finally:
+        if hostname_cache is not None:
+            hostname_cache.save()
+
+def _discover_clients(load_via_broadcast: bool = False, sweep_options: SweepOptions = None) -> Iterator[LAN_Client]:
+    """Bare (ip, mac) clients, hostname and vendor are resolved by the worker pool."""
+    sweep_options = sweep_options or SweepOptions()
+    if load_via_broadcast and sys.platform.startswith('linux'):
+        yield from _raw_arp_sweep(sweep_options)
+    elif load_via_broadcast:
+        yield from _arp_sweep(sweep_options.networks)
     else:
-        LOGGER.warning(f'Unknown sortkey [{sort_key}], default to ip.')
-        # UNknown
+        client_list = _read_neighbours() if sys.platform.startswith('linux') else None
+        if client_list is None:
+            client_list = net_helper.get_lan_clients_from_ARP_cache()
+        LOGGER.debug(f'{len(client_list)} clients retrieved from ARP cache.')
         client_list.sort(key=sort_by_ip)
+        yield from client_list
+
+# Linux rtnetlink, see linux/rtnetlink.h, linux/neighbour.h and linux/if_addr.h
+_NLM_HEADER = struct.Struct('=IHHII')     # length, type, flags, seq, pid
+_ND_MSG = struct.Struct('=BBHiHBB')       # family, pad, pad, ifindex, state, flags, type
+_IFA_MSG = struct.Struct('=BBBBI')        # family, prefixlen, flags, scope, index
+_RT_ATTR = struct.Struct('=HH')           # length, type
+_RTM_NEWADDR, _RTM_GETADDR = 20, 22
+_RTM_NEWNEIGH, _RTM_DELNEIGH, _RTM_GETNEIGH = 28, 29, 30
+_NLMSG_ERROR, _NLMSG_DONE = 2, 3
+_NLM_F_REQUEST, _NLM_F_DUMP = 0x01, 0x300
+_RTMGRP_NEIGH = 0x04
+_NDA_DST, _NDA_LLADDR = 1, 2
+_IFA_LOCAL = 2
+_RT_SCOPE_UNIVERSE = 0
+# Neighbour states that do not identify a (live) client
+_NUD_INCOMPLETE, _NUD_FAILED, _NUD_NOARP = 0x01, 0x20, 0x40
+_PROC_NET_ARP = pathlib.Path('/proc/net/arp')
+
+def _neighbour_client(ip: str, mac: str) -> LAN_Client:
+    """Client for a neighbour entry, None if it is not a LAN client (i.e. broadcast or another network)."""
+    if ip is None or mac is None or mac == '00:00:00:00:00:00':
+        return None
+    if not net_helper.is_ip_local(ip) or ip.endswith('.255'):
+        return None
+    return LAN_Client(ip, mac.upper())
+
+def _parse_netlink_messages(buffer: bytes, msg_struct: struct.Struct) -> Iterator[Tuple[int, tuple, Dict[int, bytes]]]:
+    """
+    Generate (message type, message header fields, attributes) for each message in a netlink
+    buffer, (NLMSG_DONE, None, None) ends a dump.
+    """
+    offset = 0
+    while offset + _NLM_HEADER.size <= len(buffer):
+        msg_len, msg_type, _, _, _ = _NLM_HEADER.unpack_from(buffer, offset)
+        if msg_len < _NLM_HEADER.size:
+            break
+        if msg_type == _NLMSG_ERROR:
+            errno_value = -struct.unpack_from('=i', buffer, offset + _NLM_HEADER.size)[0]
+            if errno_value:
+                raise OSError(errno_value, os.strerror(errno_value))
+        elif msg_type == _NLMSG_DONE:
+            yield msg_type, None, None
+            return
+        elif msg_len >= _NLM_HEADER.size + msg_struct.size:
+            fields = msg_struct.unpack_from(buffer, offset + _NLM_HEADER.size)
+            attrs: Dict[int, bytes] = {}
+            attr_offset = offset + _NLM_HEADER.size + msg_struct.size
+            while attr_offset + _RT_ATTR.size <= offset + msg_len:
+                attr_len, attr_type = _RT_ATTR.unpack_from(buffer, attr_offset)
+                if attr_len < _RT_ATTR.size:
+                    break
+                attrs[attr_type] = buffer[attr_offset + _RT_ATTR.size:attr_offset + attr_len]
+                attr_offset += (attr_len + 3) & ~3
+            yield msg_type, fields, attrs
+        offset += (msg_len + 3) & ~3
+
+def _netlink_dump(msg_type: int, request: bytes, msg_struct: struct.Struct) -> Iterator[Tuple[int, tuple, Dict[int, bytes]]]:
+    """rtnetlink dump request, generates the messages (see _parse_netlink_messages) until the dump is done."""
+    with socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE) as sock:
+        sock.send(_NLM_HEADER.pack(_NLM_HEADER.size + len(request), msg_type, _NLM_F_REQUEST | _NLM_F_DUMP, 1, 0) + request)
+        while True:
+            for message in _parse_netlink_messages(sock.recv(65536), msg_struct):
+                if message[0] == _NLMSG_DONE:
+                    return
+                yield message
+
+def _parse_neighbour(fields: tuple, attrs: Dict[int, bytes]) -> Tuple[int, str, str]:
+    """Returns (state, ip, mac) of an IPv4 neighbour message, state is None for other families."""
+    family, _, _, _, state, _, _ = fields
+    if family != socket.AF_INET:
+        return None, None, None
+    dst = attrs.get(_NDA_DST, b'')
+    lladdr = attrs.get(_NDA_LLADDR, b'')
+    ip = socket.inet_ntoa(dst) if len(dst) == 4 else None
+    mac = ':'.join([f'{octet:02X}' for octet in lladdr]) if len(lladdr) == 6 else None
+    return state, ip, mac
+
+def _read_neighbours() -> List[LAN_Client]:
+    """
+    Linux neighbour (ARP) table, via a netlink RTM_GETNEIGH dump (/proc/net/arp if netlink 
+    is not available).  Returns None if neither is available.
+    """
+    try:
+        clients: Dict[str, LAN_Client] = {}
+        request = _ND_MSG.pack(socket.AF_INET, 0, 0, 0, 0, 0, 0)
+        for _, fields, attrs in _netlink_dump(_RTM_GETNEIGH, request, _ND_MSG):
+            state, ip, mac = _parse_neighbour(fields, attrs)
+            if state is not None and not state & (_NUD_INCOMPLETE | _NUD_FAILED | _NUD_NOARP):
+                client = _neighbour_client(ip, mac)
+                if client is not None:
+                    clients[client.ip] = client
+        LOGGER.debug(f'{len(clients)} neighbours read via netlink.')
+        return list(clients.values())
+    except (AttributeError, OSError) as ex:
+        LOGGER.debug(f'netlink neighbour dump failed - {repr(ex)}')
+
+    try:
+        lines = _PROC_NET_ARP.read_text().splitlines()[1:]
+    except OSError as ex:
+        LOGGER.debug(f'Unable to read {_PROC_NET_ARP} - {repr(ex)}')
+        return None
+    clients = {}
+    for line in lines:
+        # IP address, HW type, Flags, HW address, Mask, Device
+        fields = line.split()
+        if len(fields) >= 4 and int(fields[2], 16) & 0x02:  # ATF_COM, entry complete
+            client = _neighbour_client(fields[0], fields[3])
+            if client is not None:
+                clients[client.ip] = client
+    LOGGER.debug(f'{len(clients)} neighbours read from {_PROC_NET_ARP}.')
+    return list(clients.values())
+
+def watch_neighbours(include_current: bool = True) -> Iterator[Tuple[str, LAN_Client]]:
+    """
+    Watch the Linux neighbour (ARP) table, generating changes as the kernel reports them.
+
+    Keyword Arguments:
+        include_current: Generate the current table entries first (as joined) (default True).
+
+    Returns:
+        Iterator of (event, LAN_Client) where event is 'joined' (new, or its MAC changed) or
+        'left' (entry removed or failed).  Hostname and vendor are not resolved.
+
+    Raises:
+        OSError: netlink is not available (not Linux, or the netlink socket can not be opened).
+    """
+    if not sys.platform.startswith('linux'):
+        raise OSError(f'netlink neighbour events are not available on {sys.platform}')
+    tracked: Dict[str, LAN_Client] = {}
+    with socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE) as sock:
+        # Subscribe before reading the table, so no change is missed in between
+        sock.bind((0, _RTMGRP_NEIGH))
+        sock.settimeout(1.0) # Stop (Ctrl-C) is checked between events
+        for client in (_read_neighbours() or []) if include_current else []:
+            tracked[client.ip] = client
+            yield 'joined', client
+        while not stop_event.is_set():
+            try:
+                buffer = sock.recv(65536)
+            except socket.timeout:
+                continue
+            for msg_type, fields, attrs in _parse_netlink_messages(buffer, _ND_MSG):
+                state, ip, mac = _parse_neighbour(fields, attrs)
+                if state is None:
+                    continue
+                known = tracked.get(ip)
+                if msg_type == _RTM_DELNEIGH or state & (_NUD_FAILED | _NUD_NOARP):
+                    if known is not None:
+                        del tracked[ip]
+                        yield 'left', known
+                elif not state & _NUD_INCOMPLETE:
+                    client = _neighbour_client(ip, mac)
+                    if client is not None and (known is None or known.mac != client.mac):
+                        tracked[ip] = client
+                        yield 'joined', client
+
+def _arp_sweep(networks: List[str] = None, sweep_wait: float = _SWEEP_WAIT) -> Iterator[LAN_Client]:
+    """
+    ARP broadcast to the networks (default local /24 network) via scapy, clients are generated
+    as their replies arrive.  Used where the raw socket sweep is not available (not Linux).
+
+    Raises:
+        PermissionError: Linux requires this call to be run as ROOT
+    """
+    if OSHelper.is_linux() and not OSHelper.is_linux_root():
+        LOGGER.critical('You must be root on linux for ARP_Broadcast to work')
+        raise PermissionError('Must be root')
+    networks = networks or [str(ipaddress.ip_network(f'{net_helper.get_local_ip()}/24', strict=False))]
+    replies = queue.SimpleQueue()
+    started = threading.Event()
+    sniffer = scapy.AsyncSniffer(store=False, prn=replies.put, started_callback=started.set,
+                                 lfilter=lambda pkt: pkt.haslayer(scapy.ARP) and pkt[scapy.ARP].op == 2)
+    sniffer.start()
+    started.wait()
+    try:
+        scapy.sendp(scapy.Ether(dst='ff:ff:ff:ff:ff:ff') / scapy.ARP(pdst=networks), verbose=False)
+        seen: Set[str] = set()
+        deadline = time.monotonic() + sweep_wait
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                reply = replies.get(timeout=remaining)
+            except queue.Empty:
+                break
+            ip: str = reply[scapy.ARP].psrc
+            if ip not in seen and net_helper.is_ip_local(ip) and not ip.endswith('.255'):
+                seen.add(ip)
+                yield LAN_Client(ip, reply[scapy.ARP].hwsrc.upper())
+        LOGGER.debug(f'{len(seen)} clients replied to ARP broadcast ({", ".join(networks)}).')
+    finally:
+        sniffer.stop()
+
+# ARP over Ethernet, see RFC 826
+_ETH_P_ARP = 0x0806
+_ARP_REQUEST, _ARP_REPLY = 1, 2
+_ARP_FRAME = struct.Struct('!6s6sHHHBBH6s4s6s')  # Ethernet header, ARP request up to target IP
+_BROADCAST_MAC = b'\xff' * 6
+
+@dataclass
+class _SweepShard():
+    """ARP requests sent from one interface, targets are IPv4 addresses (as int)."""
+    interface: str
+    address: ipaddress.IPv4Interface
+    networks: List[ipaddress.IPv4Network] = field(default_factory=list)
+    targets: List[int] = field(default_factory=list)
+    sock: socket.socket = None
+    request: bytes = b''
+    sent: int = 0
+    failed: bool = False  # Socket error (i.e. interface down), shard is no longer swept
+
+    @property
+    def done(self) -> bool:
+        return self.failed or self.sent >= len(self.targets)
+
+    def fail(self, selector: selectors.BaseSelector, ex: OSError):
+        LOGGER.warning(f'ARP broadcast on {self.interface} stopped after {self.sent} requests - {repr(ex)}')
+        self.failed = True
+        if self.sock is not None and self.sock.fileno() in selector.get_map():
+            selector.unregister(self.sock)
+
+def _interface_addresses() -> List[Tuple[str, ipaddress.IPv4Interface]]:
+    """(interface name, address/prefix) of each IPv4 interface address, loopback excluded (Linux)."""
+    addresses: List[Tuple[str, ipaddress.IPv4Interface]] = []
+    request = _IFA_MSG.pack(socket.AF_INET, 0, 0, 0, 0)
+    for _, fields, attrs in _netlink_dump(_RTM_GETADDR, request, _IFA_MSG):
+        family, prefix_len, _, scope, index = fields
+        local = attrs.get(_IFA_LOCAL, b'')
+        if family != socket.AF_INET or scope != _RT_SCOPE_UNIVERSE or len(local) != 4:
+            continue
+        address = ipaddress.IPv4Interface(f'{socket.inet_ntoa(local)}/{prefix_len}')
+        if not address.is_loopback:
+            addresses.append((socket.if_indextoname(index), address))
+    return addresses
+
+def _sweep_shards(options: SweepOptions) -> List[_SweepShard]:
+    """
+    One shard per interface, each swept network is assigned to the (first) interface
+    it overlaps.  Without networks, each interface (default: the interface of the default
+    route address) sweeps its connected network, bounded to the /24 of its address.
+    """
+    shards: List[_SweepShard] = []
+    addresses = _interface_addresses()
+    if not options.networks and not options.interfaces:
+        local_ip = net_helper.get_local_ip()
+        addresses = [(interface, address) for interface, address in addresses if str(address.ip) == local_ip] or addresses[:1]
+    for interface, address in addresses:
+        if options.interfaces and interface not in options.interfaces:
+            continue
+        if address.network.prefixlen < 31 and all([shard.interface != interface for shard in shards]):
+            shards.append(_SweepShard(interface, address))
+    for interface in set(options.interfaces or []) - set([shard.interface for shard in shards]):
+        LOGGER.warning(f'Interface {interface} has no IPv4 network, ignored.')
+
+    networks = [ipaddress.ip_network(network, strict=False) for network in options.networks or []]
+    for network in networks:
+        shard = next((shard for shard in shards if shard.address.network.overlaps(network)), None)
+        if shard is None:
+            LOGGER.warning(f'No interface is connected to {network}, not swept.')
+        else:
+            shard.networks.append(network)
+    for shard in shards:
+        if len(networks) == 0:
+            prefix_len = max(shard.address.network.prefixlen, _SWEEP_DEFAULT_PREFIX)
+            shard.networks.append(ipaddress.ip_network(f'{shard.address.ip}/{prefix_len}', strict=False))
+        own_ip = int(shard.address.ip)
+        targets = set()
+        for network in shard.networks:
+            targets.update([int(ip) for ip in network.hosts() if int(ip) != own_ip])
+        shard.targets = sorted(targets)
+    return [shard for shard in shards if len(shard.targets) > 0]
+
+def _parse_arp_reply(frame: bytes) -> Tuple[str, str]:
+    """Returns (sender ip, sender mac) of an ARP reply frame, (None, None) for other frames."""
+    if len(frame) < 42 or frame[12:14] != b'\x08\x06' or frame[20:22] != b'\x00\x02':
+        return None, None
+    return socket.inet_ntoa(frame[28:32]), ':'.join([f'{octet:02X}' for octet in frame[22:28]])
+
+def _raw_arp_sweep(options: SweepOptions) -> Iterator[LAN_Client]:
+    """
+    ARP request to every address of the networks, sent from raw (AF_PACKET) sockets at a
+    paced rate per interface.  Replies of all interfaces are collected in one receive loop,
+    so large (i.e. /16) networks can be swept, clients are generated as their replies arrive.
+
+    Raises:
+        PermissionError: Linux requires this call to be run as ROOT
+    """
+    if not OSHelper.is_linux_root():
+        LOGGER.critical('You must be root on linux for ARP_Broadcast to work')
+        raise PermissionError('Must be root')
+    shards = _sweep_shards(options)
+    if len(shards) == 0:
+        LOGGER.warning('No network to ARP broadcast.')
+        return
+    rate = max(options.rate, 1.0)
+    selector = selectors.DefaultSelector()
+    seen: Set[str] = set()
+    try:
+        for shard in shards:
+            try:
+                shard.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(_ETH_P_ARP))
+                shard.sock.bind((shard.interface, _ETH_P_ARP))
+                shard.sock.setblocking(False)
+            except OSError as ex:
+                shard.fail(selector, ex)
+                continue
+            mac = shard.sock.getsockname()[4]
+            shard.request = _ARP_FRAME.pack(_BROADCAST_MAC, mac, _ETH_P_ARP, 1, 0x0800, 6, 4, _ARP_REQUEST,
+                                            mac, shard.address.ip.packed, b'\x00' * 6)
+            selector.register(shard.sock, selectors.EVENT_READ, shard)
+            LOGGER.debug(f'{shard.interface} ({shard.address}): sweeping {len(shard.targets)} addresses '
+                         f'({", ".join([str(network) for network in shard.networks])}) at {rate:.0f}/sec.')
+        start = last_sent = time.monotonic()
+        while not stop_event.is_set():
+            now = time.monotonic()
+            for shard in shards:
+                due = min(len(shard.targets), int((now - start) * rate) + 1)
+                while not shard.failed and shard.sent < due:
+                    try:
+                        shard.sock.send(shard.request + struct.pack('!I', shard.targets[shard.sent]))
+                    except BlockingIOError:
+                        break # Socket buffer full, resent on the next pass
+                    except OSError as ex:
+                        shard.fail(selector, ex) # i.e. ENETDOWN, the other interfaces are still swept
+                        break
+                    shard.sent += 1
+                    last_sent = now
+            sending = not all([shard.done for shard in shards])
+            if not sending and now - last_sent >= options.reply_wait:
+                break
+            timeout = 1 / rate if sending else options.reply_wait - (now - last_sent)
+            for key, _ in selector.select(timeout=max(timeout, 0.001)):
+                shard: _SweepShard = key.data
+                while not shard.failed:
+                    try:
+                        frame = shard.sock.recv(2048)
+                    except BlockingIOError:
+                        break
+                    except OSError as ex:
+                        shard.fail(selector, ex)
+                        break
+                    ip, mac = _parse_arp_reply(frame)
+                    if ip is None or ip in seen:
+                        continue
+                    if any([ipaddress.IPv4Address(ip) in network for network in shard.networks]):
+                        seen.add(ip)
+                        yield LAN_Client(ip, mac)
+        LOGGER.debug(f'{len(seen)} clients replied to {sum([shard.sent for shard in shards])} ARP requests '
+                     f'in {time.monotonic() - start:.2f} seconds.')
+    finally:
+        selector.close()
+        for shard in shards:
+            if shard.sock is not None:
+                shard.sock.close()
+
+def _load_mac_info() -> Dict[str, dict]:
+    """User maintained hostname/vendor by MAC address, used when a lookup fails."""
+    if not MAC_INFO_LOCATION.exists():
+        return {}
+    try:
+        return {mac.upper(): info for mac, info in json.loads(MAC_INFO_LOCATION.read_text()).items()}
+    except (OSError, ValueError) as ex:
+        LOGGER.warning(f'Unable to load {MAC_INFO_LOCATION} - {repr(ex)}')
+        return {}
+
+class OuiDatabase():
+    """
+    Offline MAC vendor lookup from the IEEE OUI registry.
+
+    The registry CSV files are compiled (build) into a binary index, one sorted table of
+    assignment prefixes per registry plus a blob of unique organization names.  The index
+    is memory-mapped and looked up with a binary search, most specific registry (MA-S)
+    first, so nothing is parsed or loaded per lookup.
+    """
+    _MAGIC = b'OUI1'
+    _HEADER = struct.Struct('=4sIIIII')  # magic, version, MA-S, MA-M and MA-L counts, names size
+    _VERSION = 1
+    # Most specific first, (registry, prefix bits)
+    _REGISTRIES = (('MA-S', 36), ('MA-M', 28), ('MA-L', 24))
+
+    def __init__(self, filename: pathlib.Path = OUI_DB_LOCATION):
+        self.filename = pathlib.Path(filename)
+        with self.filename.open('rb') as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, *counts, names_size = self._HEADER.unpack_from(self._mmap, 0)
+        if magic != self._MAGIC or version != self._VERSION:
+            self._mmap.close()
+            raise ValueError(f'{self.filename} is not an OUI index (version {self._VERSION})')
+        view = memoryview(self._mmap)
+        self._tables: List[Tuple[int, memoryview, memoryview]] = []
+        offset = self._HEADER.size
+        for (_, bits), count in zip(self._REGISTRIES, counts):
+            prefixes = view[offset:offset + count * 8].cast('Q')
+            offset += count * 8
+            name_offsets = view[offset:offset + count * 4].cast('I')
+            offset += count * 4
+            self._tables.append((48 - bits, prefixes, name_offsets))
+        self._names_offset = offset
+        self._names: Dict[int, str] = {}  # Decoded names, vendors repeat across a LAN
+        self.entries = sum(counts)
+        LOGGER.debug(f'{self.entries} OUI entries mapped from {self.filename} ({names_size} bytes of names)')
+
+    def vendor(self, mac: str) -> str:
+        """Return the organization the MAC address is assigned to, or None."""
+        try:
+            mac_value = int(mac.replace(':', '').replace('-', ''), 16)
+        except (AttributeError, ValueError):
+            return None
+        for shift, prefixes, name_offsets in self._tables:
+            prefix = mac_value >> shift
+            idx = bisect.bisect_left(prefixes, prefix)
+            if idx < len(prefixes) and prefixes[idx] == prefix:
+                return self._name(name_offsets[idx])
+        return None
+
+    def _name(self, name_offset: int) -> str:
+        name = self._names.get(name_offset)
+        if name is None:
+            start = self._names_offset + name_offset
+            name = self._mmap[start:self._mmap.find(b'\0', start)].decode('utf-8')
+            self._names[name_offset] = name
+        return name
+
+    @classmethod
+    def build(cls, sources: List[str] = OUI_CSV_URLS, filename: pathlib.Path = OUI_DB_LOCATION) -> int:
+        """
+        Compile IEEE registry CSV files into the index, returns the number of assignments.
+
+        Arguments:
+            sources: CSV file names or URLs (default: IEEE MA-L, MA-M and MA-S registries).
+
+        Keyword Arguments:
+            filename: Index file, replaced atomically (default: ~/.IpHelper/oui.idx).
+        """
+        registries = {registry: {} for registry, _ in cls._REGISTRIES}
+        for source in sources:
+            LOGGER.debug(f'loading OUI registry {source}')
+            if '://' in source:
+                request = urllib.request.Request(source, headers={'User-Agent': 'dt-cli-tools'})
+                with urllib.request.urlopen(request, timeout=60) as resp:
+                    text = resp.read().decode('utf-8')
+            else:
+                text = pathlib.Path(source).read_text(encoding='utf-8')
+            for row in csv.DictReader(io.StringIO(text)):
+                assignments = registries.get(row.get('Registry'))
+                if assignments is not None:
+                    assignments[int(row['Assignment'], 16)] = row['Organization Name'].strip()
+
+        names = bytearray()
+        name_offsets: Dict[str, int] = {}
+        tables = []
+        for registry, _ in cls._REGISTRIES:
+            assignments = registries[registry]
+            prefixes = array.array('Q', sorted(assignments))
+            offsets = array.array('I')
+            for prefix in prefixes:
+                name = assignments[prefix]
+                if name not in name_offsets:
+                    name_offsets[name] = len(names)
+                    names += name.encode('utf-8') + b'\0'
+                offsets.append(name_offsets[name])
+            tables.append((prefixes, offsets))
+
+        counts = [len(prefixes) for prefixes, _ in tables]
+        filename = pathlib.Path(filename)
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        tmp_filename = filename.with_suffix('.tmp')
+        with tmp_filename.open('wb') as fh:
+            fh.write(cls._HEADER.pack(cls._MAGIC, cls._VERSION, *counts, len(names)))
+            for prefixes, offsets in tables:
+                fh.write(prefixes.tobytes())
+                fh.write(offsets.tobytes())
+            fh.write(names)
+        # Replaced, not rewritten, so a running lookup keeps its mapping of the old index
+        os.replace(tmp_filename, filename)
+        LOGGER.debug(f'{filename} built, ' + ', '.join([f'{registry} {count}' for (registry, _), count in zip(cls._REGISTRIES, counts)]))
+        return sum(counts)
+
+_OUI_DB: OuiDatabase = None
+_OUI_DB_LOCK = threading.Lock()
+
+def _oui_database() -> OuiDatabase:
+    """Offline vendor database, None if it has not been built (vendors are looked up online)."""
+    global _OUI_DB
+    with _OUI_DB_LOCK:
+        if _OUI_DB is None and OUI_DB_LOCATION.exists():
+            try:
+                _OUI_DB = OuiDatabase(OUI_DB_LOCATION)
+            except (OSError, ValueError) as ex:
+                LOGGER.warning(f'Unable to load OUI database {OUI_DB_LOCATION} - {repr(ex)}')
+        return _OUI_DB
+
+class _HostnameCache():
+    """
+    Hostname lookup results keyed by mac|ip, persisted as json between runs.  Failed
+    lookups are cached (as None) for the shorter negative TTL.
+    """
+    def __init__(self, filename: pathlib.Path = HOSTNAME_CACHE_LOCATION, ttl: float = _HOSTNAME_TTL,
+                 negative_ttl: float = _HOSTNAME_NEGATIVE_TTL, refresh: bool = False):
+        self._lock = threading.Lock()
+        self.filename = pathlib.Path(filename)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.refresh = refresh  # Ignore cached entries, results are still cached
+        self._entries: Dict[str, dict] = {}
+        self._updated = False
+        self.hits = 0
+        if self.filename.exists():
+            LOGGER.debug(f'loading hostname cache: {self.filename}')
+            try:
+                self._entries = json.loads(self.filename.read_text())
+            except (OSError, ValueError) as ex:
+                LOGGER.warning(f'Unable to load hostname cache {self.filename} - {repr(ex)}')
+
+    @staticmethod
+    def key(mac: str, ip: str) -> str:
+        return f'{mac}|{ip}'
+
+    def get(self, mac: str, ip: str) -> Tuple[bool, str]:
+        """Return (cached, hostname), hostname is None for a cached failed lookup."""
+        if self.refresh:
+            return False, None
+        with self._lock:
+            entry = self._entries.get(self.key(mac, ip))
+        if entry is None or self._expired(entry):
+            return False, None
+        with self._lock:
+            self.hits += 1
+        return True, entry['hostname']
+
+    def update(self, mac: str, ip: str, hostname: str):
+        entry = {
+            'hostname': hostname,
+            'resolved': datetime.datetime.now().isoformat(timespec='seconds')
+        }
+        with self._lock:
+            self._entries[self.key(mac, ip)] = entry
+            self._updated = True
+
+    def _expired(self, entry: dict) -> bool:
+        ttl = self.negative_ttl if entry['hostname'] is None else self.ttl
+        age = datetime.datetime.now() - datetime.datetime.fromisoformat(entry['resolved'])
+        return age.total_seconds() > ttl
+
+    def save(self) -> bool:
+        success = True
+        if self._updated:
+            with self._lock:
+                entries = {key: entry for key, entry in self._entries.items() if not self._expired(entry)}
+            try:
+                self.filename.parent.mkdir(parents=True, exist_ok=True)
+                self.filename.write_text(json.dumps(entries, indent=2))
+                LOGGER.debug(f'{len(entries)} hostname cache entries saved to {self.filename}')
+            except Exception as ex:
+                LOGGER.error(f'Unable to save hostname cache {self.filename} - {repr(ex)}')
+                success = False
+        return success
+
+class _VendorCache():
+    """
+    Online vendor lookup results keyed by mac, persisted as json between runs.  Failed
+    lookups (unknown, rate limited or timed out) are not cached.
+    """
+    def __init__(self, filename: pathlib.Path = VENDOR_CACHE_LOCATION, ttl: float = _VENDOR_TTL):
+        self._lock = threading.Lock()
+        self.filename = pathlib.Path(filename)
+        self.ttl = ttl
+        self._entries: Dict[str, dict] = {}
+        self._updated = False
+        if self.filename.exists():
+            LOGGER.debug(f'loading vendor cache: {self.filename}')
+            try:
+                self._entries = json.loads(self.filename.read_text())
+            except (OSError, ValueError) as ex:
+                LOGGER.warning(f'Unable to load vendor cache {self.filename} - {repr(ex)}')
+
+    def get(self, mac: str) -> str:
+        """Return the cached vendor, None if not cached (or expired)."""
+        with self._lock:
+            entry = self._entries.get(mac.upper())
+        if entry is None or self._expired(entry):
+            return None
+        return entry['vendor']
+
+    def update(self, mac: str, vendor: str):
+        entry = {
+            'vendor': vendor,
+            'resolved': datetime.datetime.now().isoformat(timespec='seconds')
+        }
+        with self._lock:
+            self._entries[mac.upper()] = entry
+            self._updated = True
+
+    def _expired(self, entry: dict) -> bool:
+        age = datetime.datetime.now() - datetime.datetime.fromisoformat(entry['resolved'])
+        return age.total_seconds() > self.ttl
+
+    def save(self) -> bool:
+        success = True
+        with self._lock:
+            updated = self._updated
+            entries = {key: entry for key, entry in self._entries.items() if not self._expired(entry)}
+            self._updated = False
+        if updated:
+            try:
+                self.filename.parent.mkdir(parents=True, exist_ok=True)
+                self.filename.write_text(json.dumps(entries, indent=2))
+                LOGGER.debug(f'{len(entries)} vendor cache entries saved to {self.filename}')
+            except Exception as ex:
+                LOGGER.error(f'Unable to save vendor cache {self.filename} - {repr(ex)}')
+                success = False
+        return success
 
-    for client in client_list:
-        spinner.caption_suffix('Loading queue.')
-        ip_queue.put(client)
-    
+_VENDOR_CACHE: _VendorCache = None
+_VENDOR_LOCK = threading.Lock()
+_vendor_next_lookup = 0.0  # Monotonic time of the next online vendor lookup slot
+
+def _vendor_cache() -> _VendorCache:
+    """Online vendor lookup cache, loaded on first use (shared by all lookups)."""
+    global _VENDOR_CACHE
+    with _VENDOR_LOCK:
+        if _VENDOR_CACHE is None:
+            _VENDOR_CACHE = _VendorCache()
+        return _VENDOR_CACHE
+
+class _Snapshot():
+    """
+    Clients (keyed by MAC) identified in the last diff mode run, persisted as json between runs.
+    """
+    def __init__(self, filename: pathlib.Path = SNAPSHOT_LOCATION):
+        self.filename = pathlib.Path(filename)
+        self.created: str = None
+        self._entries: Dict[str, dict] = {}
+        if self.filename.exists():
+            LOGGER.debug(f'loading snapshot: {self.filename}')
+            try:
+                snapshot = json.loads(self.filename.read_text())
+                self.created = snapshot['created']
+                self._entries = snapshot['clients']
+            except (OSError, ValueError, KeyError) as ex:
+                LOGGER.warning(f'Unable to load snapshot {self.filename} - {repr(ex)}')
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def exists(self) -> bool:
+        return self.created is not None
+
+    def _client(self, mac: str) -> LAN_Client:
+        entry = self._entries[mac]
+        return LAN_Client(entry['ip'], mac, entry['hostname'], entry['vendor'])
+
+    def known(self, lan_entry: LAN_Client) -> LAN_Client:
+        """
+        Client with its hostname and vendor from the snapshot, None if the client has to be
+        resolved (MAC not in the snapshot, or its IP changed).
+        """
+        entry = self._entries.get(lan_entry.mac)
+        if entry is None or entry['ip'] != lan_entry.ip:
+            return None
+        return self._client(lan_entry.mac)
+
+    def diff(self, clients: ClientTable) -> List[Tuple[str, LAN_Client, LAN_Client]]:
+        """
+        Returns (change, client, previous) for each client that joined (previous is None), left
+        (client is None) or changed (IP, hostname or MAC of an IP) since the snapshot.
+        """
+        current: Dict[str, LAN_Client] = {}
+        for lan_entry in clients.sorted():
+            current.setdefault(lan_entry.mac, lan_entry) # A MAC may answer for several IPs, first (lowest) IP
+        left = {self._entries[mac]['ip']: self._client(mac) for mac in self._entries if mac not in current}
+        changes: List[Tuple[str, LAN_Client, LAN_Client]] = []
+        for mac, lan_entry in current.items():
+            entry = self._entries.get(mac)
+            if entry is None:
+                # A new MAC on the IP of a device that left is a MAC change
+                previous = left.pop(lan_entry.ip, None)
+                changes.append(('joined' if previous is None else 'changed', lan_entry, previous))
+            elif entry['ip'] != lan_entry.ip or (lan_entry.hostname is not None and lan_entry.hostname != entry['hostname']):
+                changes.append(('changed', lan_entry, self._client(mac)))
+        changes.extend([('left', None, previous) for previous in left.values()])
+        return changes
+
+    def update(self, clients: ClientTable):
+        """Replace the snapshot with clients (clients that left are dropped)."""
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        entries: Dict[str, dict] = {}
+        for lan_entry in clients.sorted():
+            if lan_entry.mac is None or lan_entry.mac in entries:
+                continue
+            entries[lan_entry.mac] = {
+                'ip': lan_entry.ip,
+                'hostname': lan_entry.hostname,
+                'vendor': lan_entry.vendor,
+                'first_seen': self._entries.get(lan_entry.mac, {}).get('first_seen', now),
+                'last_seen': now,
+            }
+        self.created = now
+        self._entries = entries
+
+    def save(self) -> bool:
+        success = True
+        try:
+            self.filename.parent.mkdir(parents=True, exist_ok=True)
+            self.filename.write_text(json.dumps({'created': self.created, 'clients': self._entries}, indent=2))
+            LOGGER.debug(f'{len(self._entries)} snapshot entries saved to {self.filename}')
+        except Exception as ex:
+            LOGGER.error(f'Unable to save snapshot {self.filename} - {repr(ex)}')
+            success = False
+        return success
+
+class _Lookup():
+    """
+    Lookup run on a daemon thread.  The result is abandoned if it is not available by the
+    deadline (a hung DNS or vendor request never holds up the worker or process exit).
+    """
+    def __init__(self, func: Callable[[str], str], arg: str):
+        self._result: str = None
+        self._done = threading.Event()
+        threading.Thread(target=self._run, args=(func, arg), daemon=True).start()
+
+    def _run(self, func: Callable[[str], str], arg: str):
+        try:
+            self._result = func(arg)
+        except Exception as ex:
+            LOGGER.debug(f'{func.__name__}({arg}) failed - {repr(ex)}')
+        finally:
+            self._done.set()
+
+    def result(self, deadline: float) -> str:
+        return self._result if self._done.wait(max(0.0, deadline - time.monotonic())) else None
+
+def _lookup_hostname(ip: str) -> str:
+    if ip == net_helper.get_local_ip():
+        return net_helper.get_local_hostname()
+    try:
+        return socket.gethostbyaddr(ip)[0]
+    except OSError as ex:
+        LOGGER.debug(f'Unable to resolve hostname for {ip} - {repr(ex)}')
+    return None
+
+def _lookup_vendor(mac: str) -> str:
+    """
+    Online vendor lookup, paced to one request per _VENDOR_INTERVAL across all workers.  Found
+    vendors are cached, including lookups that complete after the client's deadline.
+    """
+    global _vendor_next_lookup
+    with _VENDOR_LOCK:
+        slot = max(time.monotonic(), _vendor_next_lookup)
+        _vendor_next_lookup = slot + _VENDOR_INTERVAL
+    time.sleep(max(0.0, slot - time.monotonic()))
+    vendor = net_helper.get_vendor_from_mac(mac)
+    if 'unknown' in vendor:
+        return None
+    _vendor_cache().update(mac, vendor)
+    return vendor
+
+def _resolve_client(lan_entry: LAN_Client, lookup_wait: float, mac_info: Dict[str, dict], 
+                    hostname_cache: _HostnameCache = None) -> LAN_Client:
+    """
+    Hostname and vendor are looked up concurrently, both bounded by one deadline.  A cached
+    hostname (or cached failure) is used without a lookup.
+    """
+    deadline = time.monotonic() + lookup_wait
+    cached, hostname = (False, None) if hostname_cache is None else hostname_cache.get(lan_entry.mac, lan_entry.ip)
+    hostname_lookup = None if cached else _Lookup(_lookup_hostname, lan_entry.ip)
+    oui_db = _oui_database()
+    if oui_db is not None:
+        # Offline registry is authoritative, no online lookup
+        lan_entry.vendor = None if lan_entry.mac is None else oui_db.vendor(lan_entry.mac)
+        vendor_lookup = None
+    else:
+        lan_entry.vendor = None if lan_entry.mac is None else _vendor_cache().get(lan_entry.mac)
+        vendor_lookup = None if lan_entry.mac is None or lan_entry.vendor is not None else _Lookup(_lookup_vendor, lan_entry.mac)
+    lan_entry.hostname = hostname if cached else hostname_lookup.result(deadline)
+    if vendor_lookup is not None:
+        lan_entry.vendor = vendor_lookup.result(deadline)
+    if not cached and hostname_cache is not None:
+        hostname_cache.update(lan_entry.mac, lan_entry.ip, lan_entry.hostname)
+    if lan_entry.hostname is None or lan_entry.vendor is None:
+        LOGGER.debug(f'{lan_entry.ip} hostname [{lan_entry.hostname}] vendor [{lan_entry.vendor}], check mac info.')
+        info = mac_info.get(lan_entry.mac, {})
+        if lan_entry.hostname is None and info.get('hostname'):
+            lan_entry.hostname = f'-> {info["hostname"]}'
+        if lan_entry.vendor is None and info.get('vendor'):
+            lan_entry.vendor = f'-> {info["vendor"]}'
+    return lan_entry
+
+def _resolve_clients(clients: Iterable[LAN_Client], lookup_wait: float = _LOOKUP_WAIT,
+                     on_discovered: Callable[[LAN_Client], None] = None,
+                     hostname_cache: _HostnameCache = None) -> Iterator[LAN_Client]:
+    """
+    Resolve clients on the worker pool, generated as each completes.  Clients are fed to
+    the pool as they are discovered (clients may be a live ARP sweep).  Every client is
+    generated exactly once: after a stop (Ctrl-C, or the consumer closes the generator) the
+    clients not yet resolved are passed through unresolved (ip/mac only).
+    """
+    ip_queue = queue.SimpleQueue()
+    resolved_queue = queue.SimpleQueue()
+    cancel_event = threading.Event()
+    num_threads = min(len(clients), _MAX_THREADS) if isinstance(clients, Sized) else _MAX_THREADS
+
+    def _feed():
+        try:
+            for client in clients:
+                if on_discovered is not None:
+                    on_discovered(client)
+                ip_queue.put(client)
+                if stop_event.is_set() or cancel_event.is_set():
+                    break
+        except Exception as ex:
+            LOGGER.error(f'Client discovery failed - {repr(ex)}')
+        finally:
+            for _ in range(num_threads):
+                ip_queue.put(None) # Sentinel, one per worker
+
+    resolve = functools.partial(_resolve_client, lookup_wait=lookup_wait, mac_info=_load_mac_info(), 
+                                hostname_cache=hostname_cache)
+    threading.Thread(target=_feed, name='lan-client-discovery', daemon=True).start()
+    for id in range(num_threads):
+        worker = threading.Thread(target=_queue_item_worker, args=(id, ip_queue, resolved_queue, resolve, cancel_event), 
+                                  name=f'lan-client-{id}', daemon=True)
+        worker.start()
+
+    # Each worker puts None when it is done
+    running = num_threads
+    try:
+        while running > 0:
+            lan_entry = resolved_queue.get()
+            if lan_entry is None:
+                running -= 1
+            else:
+                yield lan_entry
+    finally:
+        cancel_event.set()
+        _vendor_cache().save()
+
+def _queue_item_worker(name: str, ip_queue: queue.SimpleQueue, resolved_queue: queue.SimpleQueue, 
+                       resolve: Callable[[LAN_Client], LAN_Client], cancel_event: threading.Event):
+    lan_entry: LAN_Client
+    try:
+        while (lan_entry := ip_queue.get()) is not None:
+            if not stop_event.is_set() and not cancel_event.is_set():
+                lan_entry = resolve(lan_entry)
+            resolved_queue.put(lan_entry)
+    finally:
+        resolved_queue.put(None)
+
+class _ClientWriter(abc.ABC):
+    """
+    Streaming output, each client row is written and flushed as it is resolved (so rows are
+    in resolve order), partial results survive an interrupted run.  Filename '-' is stdout.
+    """
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.rows = 0
+        self._lock = threading.Lock() # Watch mode writes from the lookup threads
+        self._owns_fh = filename != '-' # sys.stdout may be redirected when closed, stdout is never closed
+        self._fh: TextIO = sys.stdout if filename == '-' else open(filename, 'w', encoding='utf-8', newline='')
+        self._write_header()
+        self._fh.flush()
+
+    @property
+    def location(self) -> str:
+        return 'stdout' if self.filename == '-' else str(pathlib.Path(self.filename).absolute())
+
+    def write(self, client: LAN_Client):
+        with self._lock:
+            if self._fh is None:
+                return
+            try:
+                self._write_row(client)
+                self._fh.flush()
+                self.rows += 1
+            except BrokenPipeError:
+                # Reader went away (i.e. | head), stdout is pointed at devnull so the exit flush does not fail
+                LOGGER.debug(f'{self.location} closed by reader, {self.rows} rows written.')
+                os.dup2(os.open(os.devnull, os.O_WRONLY), self._fh.fileno())
+                self._fh = None
+            except OSError as ex:
+                LOGGER.error(f'Unable to write {self.location} - {repr(ex)}')
+                self._fh = None
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None and self._owns_fh:
+                self._fh.close()
+            self._fh = None
+
+    def _write_header(self):
+        pass
+
+    @abc.abstractmethod
+    def _write_row(self, client: LAN_Client):
+        """Write one client row to self._fh (flushed by write())."""
+
+class _PipeWriter(_ClientWriter):
+    """ip|hostname|mac|vendor, unresolved fields are 'unknown'."""
+    def _write_row(self, client: LAN_Client):
+        host_name = 'unknown' if client.hostname is None else client.hostname
+        mac = 'unknown' if client.mac is None else client.mac
+        vendor = 'unknown' if client.vendor is None else client.vendor
+        self._fh.write(f'{client.ip}|{host_name}|{mac}|{vendor}\n')
+
+class _CsvWriter(_ClientWriter):
+    """CSV with a header row, unresolved fields are empty."""
+    def _write_header(self):
+        self._csv = csv.writer(self._fh)
+        self._csv.writerow(['ip', 'hostname', 'mac', 'vendor'])
+
+    def _write_row(self, client: LAN_Client):
+        self._csv.writerow([client.ip, client.hostname or '', client.mac or '', client.vendor or ''])
+
+class _NdjsonWriter(_ClientWriter):
+    """One JSON object per line, unresolved fields are null."""
+    def _write_row(self, client: LAN_Client):
+        row = {'ip': client.ip, 'hostname': client.hostname, 'mac': client.mac, 'vendor': client.vendor}
+        self._fh.write(json.dumps(row) + '\n')
+
+_WRITERS = {
+    'pipe': _PipeWriter,
+    'csv': _CsvWriter,
+    'ndjson': _NdjsonWriter,
+}
+
+def _close_writer(writer: _ClientWriter):
+    writer.close()
+    console.print(f'{console.cwrap(writer.rows, ColorFG.WHITE2)} clients written to {writer.location}.')
+
+def _build_client_list(load_via_broadcast: bool = False, sweep_options: SweepOptions = None) -> List[LAN_Client]:
+    spinner = Spinner('Searching', show_elapsed=True)
+    search_type = "ARP Broadcast" if load_via_broadcast else "ARP Cache"
+    search_display = console.cwrap(search_type, fg=ColorFG.DEFAULT, style=TextStyle.ITALIC)
+    spinner.start_spinner(f'searching for clients via {search_display}')
+    client_list = sorted(_discover_clients(load_via_broadcast, sweep_options), key=sort_by_ip)
     spinner.stop_spinner()
     console.print(f'{console.cwrap(len(client_list),ColorFG.WHITE)} clients identified via ({console.cwrap(search_type, ColorFG.WHITE)}) in {spinner.elapsed_time}.')
-    return len(client_list)
+    return client_list
 
-def _queue_item_worker(name: str):
-    lan_entry: LAN_Client
-    while not ip_queue.empty():
-        lan_entry = ip_queue.get()
-        ip_address = lan_entry.ip # ip_queue.get()
-        host_name = 'unknown' if lan_entry.hostname is None else lan_entry.hostname
-        mac = 'unknown' if lan_entry.mac is None else lan_entry.mac
-        vendor = 'unknown' if lan_entry.vendor is None else lan_entry.vendor
-        item_line = f'{ip_address:15} {host_name:28} {mac:17}  {vendor}'
-        if 'unknown' in host_name or 'unknown' in vendor:
-            item_line = console.cwrap(item_line, ColorFG.YELLOW2)
-        console.print(item_line)
-        queue_entry = f'{ip_address}|{host_name}|{mac}|{vendor}'
-        resolved_queue.put(queue_entry)
-        ip_queue.task_done()
-        if stop_event.is_set():
-            break
+def _display_client(lan_entry: LAN_Client, pending: bool = False, eol: str = '\n'):
+    unresolved = 'resolving...' if pending else 'unknown'
+    host_name = unresolved if lan_entry.hostname is None else lan_entry.hostname
+    mac = 'unknown' if lan_entry.mac is None else lan_entry.mac
+    vendor = unresolved if lan_entry.vendor is None else lan_entry.vendor
+    item_line = f'{lan_entry.ip:15} {host_name:28} {mac:17}  {vendor}'
+    if pending:
+        item_line = console.cwrap(item_line, style=TextStyle.ITALIC)
+    elif 'unknown' in host_name or 'unknown' in vendor:
+        item_line = console.cwrap(item_line, ColorFG.YELLOW2)
+    console.print(item_line, eol=eol)
 
-def _process_queue():
-    start = time.time()
-    threads = []
-    num_threads = min(ip_queue.qsize(), 30)
+def _display_client_table(clients: List[LAN_Client]):
     console.print('')
     console.print_line_separator('IP Address      Hostname                     MAC                MAC Vendor', 100)
-    for id in range(num_threads):
-        worker = threading.Thread(target=_queue_item_worker,args=(id,), daemon=True)        # worker.setDaemon(True)
-        worker.start()
-        threads.append(worker)
-        time.sleep(.1)
+    for lan_entry in clients:
+        _display_client(lan_entry)
 
-    while not ip_queue.empty() and not stop_event.is_set():
-        time.sleep(2)
-    
-    for thread in threads:
-        thread.join()
+class _LiveTable():
+    """
+    Client rows displayed as discovered, rewritten in place when resolved.  Without a
+    console (i.e. output redirected) each row is displayed once, when resolved.
+    """
+    def __init__(self, in_place: bool = True):
+        self._lock = threading.Lock()
+        self.clients = ClientTable()
+        self._in_place = in_place
+
+    def add(self, lan_entry: LAN_Client):
+        with self._lock:
+            self.clients.add(lan_entry)
+            if self._in_place:
+                _display_client(lan_entry, pending=True)
+
+    def update(self, lan_entry: LAN_Client):
+        with self._lock:
+            row = self.clients.add(lan_entry)
+            if not self._in_place:
+                _display_client(lan_entry)
+                return
+            offset = len(self.clients) - row
+            console_rows = console.get_console_size()[0]
+            if 0 < console_rows <= offset:
+                return # Scrolled off the screen, listed in the summary
+            console.cursor_save_position()
+            console.cursor_up(offset)
+            console.print('\r', eol='')
+            console.clear_to_EOL()
+            _display_client(lan_entry, eol='')
+            console.cursor_restore_position()
+
+def _process_clients(client_list: List[LAN_Client], sort_keys: List[SORT_KEY] = None, lookup_wait: float = _LOOKUP_WAIT, 
+                     hostname_cache: _HostnameCache = None, writer: _ClientWriter = None) -> List[LAN_Client]:
+    start = time.time()
+    num_threads = min(len(client_list), _MAX_THREADS)
+    spinner = Spinner('Resolving', show_elapsed=True)
+    spinner.start_spinner(f'resolving hostname and vendor using {num_threads} threads')
+    table = ClientTable()
+    for lan_entry in _resolve_clients(client_list, lookup_wait, hostname_cache=hostname_cache):
+        table.add(lan_entry)
+        if writer is not None:
+            writer.write(lan_entry)
+    resolved = table.sorted(sort_keys)
+    spinner.stop_spinner()
+    if stop_event.is_set():
+        LOGGER.warning('Interrupted, clients not yet resolved are listed by ip/mac only.')
+    _display_client_table(resolved)
 
     elapsed = f'{time.time() - start:.2f}'
-    summary_line = f'\n{console.cwrap(resolved_queue.qsize(), ColorFG.WHITE2)} entries resolved in {console.cwrap(elapsed, ColorFG.WHITE2)} seconds using {num_threads} threads.'
+    summary_line = f'\n{console.cwrap(len(resolved), ColorFG.WHITE2)} entries resolved in {console.cwrap(elapsed, ColorFG.WHITE2)} seconds using {num_threads} threads.'
     console.print(summary_line, eol='\n\n')
+    return resolved
 
-def _dump_resolved_hosts_to_file(out_filename: str) -> bool:
-    success = False
-    out_buff = ''
-    while not resolved_queue.empty():
-        host_tuple = resolved_queue.get()
-        out_buff += f'{host_tuple}\n'
-    fh = pathlib.Path(out_filename)
-    try:
-        fh.write_text(out_buff, encoding='utf-8')
-        console.print(f'Dump file: {fh.absolute()} created.')
-        success = True
-    except Exception as ex: 
-        LOGGER.exception(f'Unable to create {fh.absolute()} {repr(ex)}')
+def _stream_clients(load_via_broadcast: bool = False, sort_keys: List[SORT_KEY] = None, lookup_wait: float = _LOOKUP_WAIT, 
+                    hostname_cache: _HostnameCache = None, in_place: bool = True, 
+                    sweep_options: SweepOptions = None, writer: _ClientWriter = None) -> List[LAN_Client]:
+    """Display clients as discovered, followed by a sorted summary."""
+    start = time.time()
+    search_type = "ARP Broadcast" if load_via_broadcast else "ARP Cache"
+    search_display = console.cwrap(search_type, fg=ColorFG.DEFAULT, style=TextStyle.ITALIC)
+    console.print(f'Searching for clients via {search_display}, hostname and vendor are resolved as clients are found.')
+    console.print('')
+    console.print_line_separator('IP Address      Hostname                     MAC                MAC Vendor', 100)
+    table = _LiveTable(in_place)
+    first_elapsed = None
+    clients = _discover_clients(load_via_broadcast, sweep_options)
+    for lan_entry in _resolve_clients(clients, lookup_wait, on_discovered=table.add, hostname_cache=hostname_cache):
+        table.update(lan_entry)
+        if writer is not None:
+            writer.write(lan_entry)
+        if first_elapsed is None:
+            first_elapsed = time.time() - start
+    if stop_event.is_set():
+        LOGGER.warning('Interrupted, clients not yet resolved are listed by ip/mac only.')
+
+    resolved = table.clients.sorted(sort_keys)
+    _display_client_table(resolved)
+    elapsed = f'{time.time() - start:.2f}'
+    first = '' if first_elapsed is None else f', first in {console.cwrap(f"{first_elapsed:.2f}", ColorFG.WHITE2)} seconds'
+    summary_line = f'\n{console.cwrap(len(resolved), ColorFG.WHITE2)} clients identified via ({console.cwrap(search_type, ColorFG.WHITE)}) and resolved in {console.cwrap(elapsed, ColorFG.WHITE2)} seconds{first}.'
+    console.print(summary_line, eol='\n\n')
+    return resolved
+
+def _display_change(change: str, lan_entry: LAN_Client, previous: LAN_Client):
+    if change == 'joined':
+        console.print(f'{console.cwrap("+", ColorFG.GREEN2)} ', eol='')
+        _display_client(lan_entry)
+    elif change == 'left':
+        console.print(f'{console.cwrap("-", ColorFG.YELLOW2)} ', eol='')
+        _display_client(previous)
+    else:
+        console.print(f'{console.cwrap("~", ColorFG.WHITE2)} ', eol='')
+        _display_client(lan_entry)
+        details = [f'{field} {getattr(previous, field)} -> {getattr(lan_entry, field)}' for field in ['ip', 'hostname', 'mac']
+                   if getattr(previous, field) != getattr(lan_entry, field) and getattr(lan_entry, field) is not None]
+        console.print(f'  {"":15} {console.cwrap(", ".join(details), style=TextStyle.ITALIC)}')
+
+def _recheck_hostnames(clients: List[LAN_Client], lookup_wait: float, hostname_cache: _HostnameCache):
+    """
+    Update the hostname of clients whose hostname cache entry has expired (reverse lookups, in
+    batches of _MAX_THREADS).  A failed lookup keeps the client's current hostname.
+    """
+    expired: List[LAN_Client] = []
+    for client in clients:
+        cached, hostname = hostname_cache.get(client.mac, client.ip)
+        if not cached:
+            expired.append(client)
+        elif hostname is not None:
+            client.hostname = hostname
+    LOGGER.debug(f'{len(expired)} of {len(clients)} known client hostnames re-checked.')
+    if len(expired) == 0:
+        return
+    spinner = Spinner('Resolving', show_elapsed=True)
+    spinner.start_spinner(f're-checking hostname of {len(expired)} known clients')
+    for idx in range(0, len(expired), _MAX_THREADS):
+        if stop_event.is_set():
+            break
+        deadline = time.monotonic() + lookup_wait
+        lookups = [(client, _Lookup(_lookup_hostname, client.ip)) for client in expired[idx:idx + _MAX_THREADS]]
+        for client, lookup in lookups:
+            hostname = lookup.result(deadline)
+            hostname_cache.update(client.mac, client.ip, hostname)
+            if hostname is not None:
+                client.hostname = hostname
+    spinner.stop_spinner()
 
-    return success
+def _diff_clients(snapshot: _Snapshot, load_via_broadcast: bool = False, lookup_wait: float = _LOOKUP_WAIT, 
+                  hostname_cache: _HostnameCache = None, sweep_options: SweepOptions = None, 
+                  writer: _ClientWriter = None) -> int:
+    """
+    Report clients that joined, left or changed since the snapshot, then update the snapshot.  Only
+    clients not in the snapshot (new MAC, or changed IP) are resolved, unless hostnames are refreshed.
+    Known clients keep their snapshot vendor, their hostname is re-checked (reverse lookup only) once
+    its hostname cache entry has expired, so hostname changes are reported within the cache TTL.
+    Returns the number of changes.
+    """
+    client_list = _build_client_list(load_via_broadcast, sweep_options)
+    table = ClientTable()
+    unresolved: List[LAN_Client] = []
+    known_clients: List[LAN_Client] = []
+    for lan_entry in client_list:
+        known = None if hostname_cache is not None and hostname_cache.refresh else snapshot.known(lan_entry)
+        if known is None:
+            unresolved.append(lan_entry)
+        else:
+            known_clients.append(known)
+    if hostname_cache is not None:
+        _recheck_hostnames(known_clients, lookup_wait, hostname_cache)
+    for known in known_clients:
+        table.add(known)
+        if writer is not None:
+            writer.write(known)
+
+    if len(unresolved) > 0:
+        spinner = Spinner('Resolving', show_elapsed=True)
+        spinner.start_spinner(f'resolving hostname and vendor of {len(unresolved)} new/changed clients')
+        for lan_entry in _resolve_clients(unresolved, lookup_wait, hostname_cache=hostname_cache):
+            table.add(lan_entry)
+            if writer is not None:
+                writer.write(lan_entry)
+        spinner.stop_spinner()
+    LOGGER.debug(f'{len(table) - len(unresolved)} clients from snapshot, {len(unresolved)} resolved.')
+
+    console.print('')
+    if not snapshot.exists:
+        changes = []
+        console.print(f'Snapshot {snapshot.filename} created, {console.cwrap(len(table), ColorFG.WHITE2)} clients.')
+    else:
+        changes = snapshot.diff(table)
+        console.print_line_separator('  IP Address      Hostname                     MAC                MAC Vendor', 100)
+        for change, lan_entry, previous in changes:
+            _display_change(change, lan_entry, previous)
+        counts = {change: len([entry for entry in changes if entry[0] == change]) for change in ['joined', 'left', 'changed']}
+        console.print('')
+        console.print(', '.join([f'{console.cwrap(count, ColorFG.WHITE2)} {change}' for change, count in counts.items()]) + 
+                      f' since {snapshot.created} ({len(table)} clients).')
+    if stop_event.is_set():
+        # Clients not identified in an interrupted run are not known to have left
+        LOGGER.warning('Interrupted, snapshot not updated.')
+    else:
+        snapshot.update(table)
+        snapshot.save()
+    return len(changes)
+
+def _watch_clients(lookup_wait: float = _LOOKUP_WAIT, hostname_cache: _HostnameCache = None, 
+                   writer: _ClientWriter = None) -> int:
+    """Display clients as they join/leave the neighbour table until Ctrl-C, returns number of clients seen."""
+    resolve = functools.partial(_resolve_client, lookup_wait=lookup_wait, mac_info=_load_mac_info(), 
+                                hostname_cache=hostname_cache)
+    display_lock = threading.Lock()
+    seen: Set[str] = set()
+
+    def _joined(lan_entry: LAN_Client):
+        resolve(lan_entry)
+        with display_lock:
+            console.print(f'{datetime.datetime.now():%H:%M:%S} {console.cwrap("+", ColorFG.GREEN2)} ', eol='')
+            _display_client(lan_entry)
+        if writer is not None:
+            writer.write(lan_entry)
+
+    console.print('Watching the neighbour table for clients joining/leaving, Ctrl-C to stop.')
+    console.print('')
+    console.print_line_separator('Time     + IP Address      Hostname                     MAC                MAC Vendor', 100)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=_MAX_THREADS, thread_name_prefix='lan-client') as executor:
+        try:
+            for event, lan_entry in watch_neighbours():
+                if event == 'joined':
+                    seen.add(lan_entry.ip)
+                    executor.submit(_joined, lan_entry)
+                else:
+                    with display_lock:
+                        console.print(f'{datetime.datetime.now():%H:%M:%S} {console.cwrap("-", ColorFG.YELLOW2)} '
+                                      f'{lan_entry.ip:15} {"left":28} {lan_entry.mac:17}')
+        except OSError as ex:
+            LOGGER.error(f'Unable to watch the neighbour table (Linux only) - {repr(ex)}')
+    _vendor_cache().save()
+    console.print('')
+    console.print(f'{console.cwrap(len(seen), ColorFG.WHITE2)} clients seen.')
+    return len(seen)
+
+def _refresh_oui_database(sources: List[str]) -> int:
+    start = time.time()
+    try:
+        entries = OuiDatabase.build(sources, OUI_DB_LOCATION)
+    except Exception as ex:
+        LOGGER.error(f'Unable to build OUI database - {repr(ex)}')
+        return 1
+    elapsed = f'{time.time() - start:.2f}'
+    console.print(f'OUI database {OUI_DB_LOCATION} built, {console.cwrap(entries, ColorFG.WHITE2)} assignments in {console.cwrap(elapsed, ColorFG.WHITE2)} seconds.')
+    return 0
 
 def _signal_handler(signum, frame):
-    print('CTRL-C: Waiting for threads to stop...')
+    print('CTRL-C: Waiting for lookups in progress, Ctrl-C again to abort...')
     stop_event.set()
-    sys.exit(1)
-
-signal.signal(signal.SIGINT, _signal_handler)
+    # Second Ctrl-C aborts
+    signal.signal(signal.SIGINT, signal.default_int_handler)
 
 def main() -> int:
     parser = argparse.ArgumentParser()
     parser.formatter_class = argparse.RawDescriptionHelpFormatter
     parser.description = "lan-clients - find clients on network."
     parser.add_argument('-o', '--output', type=str, required=False, metavar='filename',
-                            help='Output file containing resolved hostnames')
+                            help="Output file, rows written as clients are resolved ('-' for stdout)")
+    parser.add_argument('-f', '--format', choices=list(_WRITERS), default='pipe',
+                            help="Output file format, pipe '|' delimited, csv or ndjson (default pipe)")
     parser.add_argument('-b', '--broadcast', action='store_true', default=False, 
                             help='Use ARP Broadcast vs Cache to identify clients')
+    parser.add_argument('--network', nargs='+', metavar='cidr',
+                            help='Networks to ARP broadcast (implies -b, default /24 of each interface, wider networks must be given)')
+    parser.add_argument('--interface', nargs='+', metavar='name',
+                            help='Interfaces to ARP broadcast from (implies -b, default the default route interface)')
+    parser.add_argument('--rate', type=float, default=_SWEEP_RATE, metavar='pps',
+                            help=f'ARP broadcast requests per second, per interface (default {_SWEEP_RATE:.0f})')
     parser.add_argument('-l', '--list', action='store_true', default=False,
                             help='List contents of user maintained MAC cache')
-    parser.add_argument('-s', '--sort', choices=['ip','hostname','mac','vendor'], default='ip', 
-                            help='Sort key (default ip)')
+    parser.add_argument('-s', '--sort', type=_sort_keys, default='ip', metavar='key[,key...]',
+                            help='Sort keys, comma separated ip, hostname, mac or vendor (i.e. vendor,ip) (default ip)')
+    parser.add_argument('--stream', action='store_true', default=False,
+                            help='Display clients as they are found, updated as resolved, then a sorted summary')
+    parser.add_argument('-w', '--wait', type=float, default=_LOOKUP_WAIT, metavar='secs',
+                            help=f'Seconds to wait for hostname/vendor lookups (default {_LOOKUP_WAIT})')
+    parser.add_argument('-r', '--refresh', action='store_true', default=False,
+                            help='Re-resolve all hostnames, ignoring the hostname cache')
+    parser.add_argument('--cache_ttl', type=float, default=_HOSTNAME_TTL, metavar='secs',
+                            help=f'Seconds a resolved hostname is cached (default {_HOSTNAME_TTL})')
+    parser.add_argument('--negative_ttl', type=float, default=_HOSTNAME_NEGATIVE_TTL, metavar='secs',
+                            help=f'Seconds a failed hostname lookup is cached (default {_HOSTNAME_NEGATIVE_TTL})')
+    parser.add_argument('-d', '--diff', action='store_true', default=False,
+                            help='Diff mode, report clients that joined/left/changed since the last (snapshot) run, hostnames re-checked after --cache_ttl')
+    parser.add_argument('--snapshot', type=str, default=str(SNAPSHOT_LOCATION), metavar='filename',
+                            help='Diff mode snapshot file (default ~/.IpHelper/LanClientSnapshot.json)')
+    parser.add_argument('-W', '--watch', action='store_true', default=False,
+                            help='Watch the neighbour (ARP) table, display clients as they join/leave (Linux)')
+    parser.add_argument('--refresh_oui', nargs='*', metavar='csv',
+                            help='Rebuild the offline vendor (OUI) database from IEEE registry CSV files or URLs (default IEEE site)')
     parser.add_argument('-v', '--verbose', action='count', default=0,
                             help='Enable verbose console messages')
     args = parser.parse_args()
+    signal.signal(signal.SIGINT, _signal_handler)
     if args.verbose == 0:
         log_lvl = "INFO"
     elif args.verbose == 1:
@@ -219,25 +1583,65 @@ def main() -> int:
         log_lvl = "TRACE"
     lh.configure_logger(log_level=log_lvl)
 
-    version = f"(v{console.cwrap(ProjectHelper.determine_version('dt-cli-tools'), style=[TextStyle.ITALIC, TextStyle.UNDERLINE])})"
-    console.print_line_separator(' ', 80)
-    console.print_line_separator(f'{parser.prog} {version}', 80)
-    console.print('')
-    if args.list:
-        from dt_tools.net.ip_info_helper import IpHelper as ih
-        ih().list_mac_cache()
-        return 0
-    
-    start = time.time()
-    sort_key = SORT_KEY[args.sort.upper()]
-    num_clients = _build_queue(args.broadcast, sort_key=sort_key)
-    _process_queue()
+    writer: _ClientWriter = None
     if args.output:
-        _dump_resolved_hosts_to_file(args.output)
-    
-    elapsed = f'{time.time() - start:.2f}'
-    console.print(f'Total elapsed time {console.cwrap(elapsed, ColorFG.WHITE2, style=TextStyle.BOLD)} seconds.')
-    return num_clients
+        try:
+            writer = _WRITERS[args.format](args.output)
+        except OSError as ex:
+            LOGGER.error(f'Unable to create {args.output} - {repr(ex)}')
+            return 0
+
+    with contextlib.ExitStack() as stack:
+        if args.output == '-':
+            # Rows are piped to stdout, console output goes to stderr
+            stack.enter_context(contextlib.redirect_stdout(sys.stderr))
+        if writer is not None:
+            stack.callback(_close_writer, writer)
+
+        version = f"(v{console.cwrap(ProjectHelper.determine_version('dt-cli-tools'), style=[TextStyle.ITALIC, TextStyle.UNDERLINE])})"
+        console.print_line_separator(' ', 80)
+        console.print_line_separator(f'{parser.prog} {version}', 80)
+        console.print('')
+        if args.list:
+            from dt_tools.net.ip_info_helper import IpHelper as ih
+            ih().list_mac_cache()
+            return 0
+        if args.refresh_oui is not None:
+            return _refresh_oui_database(args.refresh_oui or OUI_CSV_URLS)
+
+        start = time.time()
+        try:
+            sweep_options = SweepOptions(networks=[str(ipaddress.ip_network(network, strict=False)) for network in args.network or []],
+                                         interfaces=args.interface, rate=args.rate)
+        except ValueError as ex:
+            LOGGER.error(f'Invalid network - {ex}')
+            return 0
+        load_via_broadcast = args.broadcast or args.network is not None or args.interface is not None
+        hostname_cache = _HostnameCache(ttl=max(args.cache_ttl, 0), negative_ttl=max(args.negative_ttl, 0), refresh=args.refresh)
+        if args.watch:
+            num_clients = _watch_clients(max(args.wait, 0.1), hostname_cache, writer)
+            hostname_cache.save()
+            return num_clients
+        if args.diff:
+            num_changes = _diff_clients(_Snapshot(args.snapshot), load_via_broadcast, max(args.wait, 0.1), hostname_cache, 
+                                        sweep_options, writer)
+            hostname_cache.save()
+            return min(num_changes, 999)
+        if args.stream:
+            # Rows are rewritten in place, not possible with debug logging or redirected output
+            client_list = _stream_clients(load_via_broadcast, args.sort, max(args.wait, 0.1), hostname_cache,
+                                          in_place=args.verbose == 0 and console.valid_console(), 
+                                          sweep_options=sweep_options, writer=writer)
+            resolved = client_list
+        else:
+            client_list = _build_client_list(load_via_broadcast, sweep_options)
+            resolved = _process_clients(client_list, args.sort, max(args.wait, 0.1), hostname_cache, writer)
+        LOGGER.debug(f'{hostname_cache.hits} of {len(resolved)} hostnames from cache.')
+        hostname_cache.save()
+
+        elapsed = f'{time.time() - start:.2f}'
+        console.print(f'Total elapsed time {console.cwrap(elapsed, ColorFG.WHITE2, style=TextStyle.BOLD)} seconds.')
+        return len(client_list)
 
 if __name__ == "__main__":
     sys.exit(main())
@@ -0,0 +1,306 @@
+"""
+Benchmark port-check scan throughput against a local loopback port farm.
+
+A stand-in target is created on a loopback address (default 127.0.0.1, the
+address must reverse resolve to pass port-check host validation) with a
+configurable number of:
+
+- open ports: listening sockets, connections are accepted and closed.
+- closed ports: bound but not listening, connect is refused (RST).
+- black-hole ports: accept queue is full, SYNs are dropped and the connect times out.
+
+The scan path (_process_host_connection and _process_host_file) is run for each
+engine and concurrency level, each case in a separate process so peak memory
+is measured in isolation.  No network access is required.
+
+**Usage**:
+
+    python -m dt_tools.cli.port_check_bench [-h] [--host ip] [--base_port port] [--open num]
+                                            [--closed num] [--blackhole num] [-w secs]
+                                            [-c levels] [-e engines] [--lines num] [-v]
+
+    - --host: loopback address for the port farm (default 127.0.0.1)
+    - --base_port: first port of the farm (default 20000)
+    - --open, --closed, --blackhole: number of ports of each type
+    - -w: port-check wait (timeout) in seconds
+    - -c: comma separated concurrency levels (default 50,250,1000)
+    - -e: comma separated engines (default async,thread)
+    - --lines: number of host lines in the -i file case (default 4)
+
+**Returns**:
+
+    int: 0 if every case reported the expected open ports, else number of failed cases.
+
+"""
+import argparse
+import multiprocessing
+import pathlib
+import queue
+import selectors
+import socket
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import List
+
+from loguru import logger as LOGGER
+
+import dt_tools.cli.port_check_cli as port_check
+import dt_tools.logger.logging_helper as lh
+from dt_tools.console.console_helper import ColorFG, TextStyle
+from dt_tools.console.console_helper import ConsoleHelper as console
+from dt_tools.os.project_helper import ProjectHelper
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+@dataclass
+class _BenchResult():
+    mode: str
+    engine: str
+    concurrency: int
+    ports: int = 0
+    open_ports: int = 0
+    elapsed: float = 0.0
+    p50: float = 0.0
+    p99: float = 0.0
+    peak_mb: float = 0.0
+    ok: bool = False
+
+    @property
+    def ports_per_sec(self) -> float:
+        return self.ports / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class _PortFarm():
+    """
+    Local stand-in target with open, closed and black-hole ports on a loopback address.
+    """
+    def __init__(self, host: str = '127.0.0.1', base_port: int = 20000,
+                 open_cnt: int = 100, closed_cnt: int = 1000, blackhole_cnt: int = 100):
+        self.host = host
+        self.base_port = base_port
+        self.open_cnt = open_cnt
+        self.closed_cnt = closed_cnt
+        self.blackhole_cnt = blackhole_cnt
+        self._sockets: List[socket.socket] = []
+        self._selector = selectors.DefaultSelector()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread = None
+
+    @property
+    def port_spec(self) -> str:
+        return f'{self.base_port}-{self.base_port + self.num_ports - 1}'
+
+    @property
+    def num_ports(self) -> int:
+        return self.open_cnt + self.closed_cnt + self.blackhole_cnt
+
+    def start(self):
+        port = self.base_port
+        for _ in range(self.open_cnt):
+            listener = self._bind(port)
+            listener.listen(128)
+            listener.setblocking(False)
+            self._selector.register(listener, selectors.EVENT_READ)
+            port += 1
+        for _ in range(self.closed_cnt):
+            self._bind(port) # Bound, not listening: connect is refused
+            port += 1
+        for _ in range(self.blackhole_cnt):
+            listener = self._bind(port)
+            listener.listen(0)
+            # Fill the accept queue, further SYNs are dropped
+            filler = socket.create_connection((self.host, port), timeout=1)
+            self._sockets.append(filler)
+            port += 1
+        if self.open_cnt > 0:
+            self._thread = threading.Thread(target=self._accept_loop, daemon=True)
+            self._thread.start()
+        LOGGER.debug(f'port farm {self.host}:{self.port_spec} started, {len(self._sockets)} sockets.')
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._selector.close()
+        for sock in self._sockets:
+            sock.close()
+        self._sockets.clear()
+
+    def _bind(self, port: int) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.bind((self.host, port))
+        except OSError as ex:
+            sock.close()
+            raise OSError(f'Unable to bind {self.host}:{port}, try another --base_port - {repr(ex)}') from ex
+        self._sockets.append(sock)
+        return sock
+
+    def _accept_loop(self):
+        while not self._stop_event.is_set():
+            for key, _ in self._selector.select(timeout=0.1):
+                try:
+                    conn, _ = key.fileobj.accept()
+                    conn.close()
+                except BlockingIOError:
+                    pass
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if len(sorted_values) == 0:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+def _raise_fd_limit():
+    if resource is not None:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+def _peak_memory_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _run_case(mode: str, engine: str, concurrency: int, farm_host: str, port_spec: str,
+              wait: float, lines: int, result_queue: multiprocessing.Queue):
+    LOGGER.remove()
+    _raise_fd_limit()
+    latencies: List[float] = []
+    open_ports = 0
+
+    def _on_result(result: port_check.PortResult):
+        nonlocal open_ports
+        latencies.append(result.elapsed)
+        open_ports += 1 if result.is_open else 0
+
+    options = port_check.ScanOptions(wait=wait, only_open=True, engine=engine, max_concurrent=concurrency,
+                                      on_result=_on_result)
+    start = time.perf_counter()
+    if mode == 'connection':
+        port_check._process_host_connection(f'{farm_host}:{port_spec}', options)
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            host_file = pathlib.Path(tmp_dir) / 'hosts.txt'
+            host_file.write_text('\n'.join([f'{farm_host}:{port_spec}'] * lines))
+            port_check._process_host_file(str(host_file), options)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    result_queue.put(_BenchResult(mode, engine, concurrency, ports=len(latencies), open_ports=open_ports,
+                                  elapsed=elapsed, p50=_percentile(latencies, 50) * 1000,
+                                  p99=_percentile(latencies, 99) * 1000, peak_mb=_peak_memory_mb()))
+
+def _case_result(proc: multiprocessing.Process, result_queue: multiprocessing.Queue) -> _BenchResult:
+    """Result of a case process, None if the process exits without one."""
+    while True:
+        try:
+            return result_queue.get(timeout=0.5)
+        except queue.Empty:
+            if not proc.is_alive():
+                break
+    try:
+        # Result may have been put just before the process exited
+        return result_queue.get(timeout=0.5)
+    except queue.Empty:
+        return None
+
+def _run_bench(farm: _PortFarm, engines: List[str], levels: List[int], wait: float, lines: int) -> List[_BenchResult]:
+    results: List[_BenchResult] = []
+    for mode in ['connection', 'file']:
+        expected_open = farm.open_cnt * (1 if mode == 'connection' else lines)
+        for engine in engines:
+            for concurrency in levels:
+                result_queue = multiprocessing.Queue()
+                proc = multiprocessing.Process(target=_run_case,
+                                               args=(mode, engine, concurrency, farm.host, farm.port_spec,
+                                                     wait, lines, result_queue))
+                proc.start()
+                result = _case_result(proc, result_queue)
+                proc.join()
+                if result is None:
+                    # Case process died (fd exhaustion, OOM, exception), recorded as failed
+                    LOGGER.error(f'{mode} {engine} {concurrency}: case process failed, exit code {proc.exitcode}')
+                    result = _BenchResult(mode, engine, concurrency)
+                else:
+                    result.ok = result.open_ports == expected_open
+                _display_result(result)
+                results.append(result)
+    return results
+
+def _display_result(result: _BenchResult):
+    status = console.cwrap('ok', fg=ColorFG.GREEN2) if result.ok else console.cwrap('FAIL', fg=ColorFG.RED2, style=TextStyle.BOLD)
+    LOGGER.info(f'{result.mode:10}  {result.engine:6}  {result.concurrency:5d}  {result.ports:7d}  {result.open_ports:6d}  '
+                f'{result.elapsed:7.2f}  {result.ports_per_sec:9.0f}  {result.p50:8.2f}  {result.p99:8.2f}  '
+                f'{result.peak_mb:7.1f}  {status}')
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog='port_check_bench')
+    parser.description = 'Benchmark port-check scan throughput against a local loopback port farm.'
+    parser.add_argument('--host', type=str, default='127.0.0.1', metavar='ip',
+                            help='Loopback address for the port farm (default 127.0.0.1)')
+    parser.add_argument('--base_port', type=int, default=20000, metavar='port',
+                            help='First port of the farm (default 20000)')
+    parser.add_argument('--open', type=int, default=100, metavar='num',
+                            help='Number of open ports (default 100)')
+    parser.add_argument('--closed', type=int, default=2000, metavar='num',
+                            help='Number of closed ports (default 2000)')
+    parser.add_argument('--blackhole', type=int, default=100, metavar='num',
+                            help='Number of black-hole (timeout) ports (default 100)')
+    parser.add_argument('-w', '--wait', type=float, default=0.5, metavar='secs',
+                            help='Time to wait for connection (default 0.5 seconds)')
+    parser.add_argument('-c', '--concurrency', type=str, default='50,250,1000', metavar='levels',
+                            help='Comma separated concurrency levels (default 50,250,1000)')
+    parser.add_argument('-e', '--engines', type=str, default=','.join(port_check.ENGINES), metavar='engines',
+                            help='Comma separated engines (default async,thread)')
+    parser.add_argument('--lines', type=int, default=4, metavar='num',
+                            help='Number of host lines for the input file case (default 4)')
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                            help='-v:debug -vv:trace')
+    args = parser.parse_args()
+    lh.configure_logger(log_level="INFO" if args.verbose == 0 else "DEBUG", brightness=False)
+
+    version = f"(v{console.cwrap(ProjectHelper.determine_version('dt-cli-tools'), fg=ColorFG.WHITE2, style=[TextStyle.ITALIC, TextStyle.UNDERLINE])})"
+    console.print_line_separator(' ', 100)
+    console.print_line_separator(f'{parser.prog} {version}', 100)
+
+    engines = [engine for engine in args.engines.split(',') if engine in port_check.ENGINES]
+    levels = [int(level) for level in args.concurrency.split(',') if level.isdigit()]
+    if len(engines) == 0 or len(levels) == 0:
+        LOGGER.error('Invalid engines or concurrency levels')
+        return 1000
+
+    _raise_fd_limit()
+    farm = _PortFarm(args.host, args.base_port, args.open, args.closed, args.blackhole)
+    try:
+        farm.start()
+    except OSError as ex:
+        LOGGER.error(str(ex))
+        farm.stop()
+        return 1001
+
+    LOGGER.info('')
+    LOGGER.info(f'Port farm {farm.host}:{farm.port_spec} - {farm.open_cnt} open, {farm.closed_cnt} closed, '
+                f'{farm.blackhole_cnt} black-hole, wait {args.wait}s')
+    LOGGER.info('')
+    LOGGER.info('Mode        Engine   Conc    Ports    Open     Secs    Ports/s   p50 ms    p99 ms  Peak MB')
+    LOGGER.info('----------  ------  -----  -------  ------  -------  ---------  --------  --------  -------')
+    try:
+        results = _run_bench(farm, engines, levels, args.wait, max(args.lines, 1))
+    finally:
+        farm.stop()
+
+    return len([result for result in results if not result.ok])
+
+if __name__ == "__main__":
+    sys.exit(main())
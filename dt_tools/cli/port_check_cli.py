@@ -4,21 +4,48 @@ This module checks for open[/closed] ports on target host(s).
 **Features**:
 
 - Check a port, a list of ports, range of ports or common ports
+- Common ports are checked first, optionally stop after the first (or N) open ports
+- Optional service identification (banner, HTTP, TLS) on open ports, reusing the connection
 - Limit output to only show open ports
-- Check multiple hosts via an input file of hostnames(and ports)
-- Threaded to improve performance for large number of ports
+- Diff mode, only report ports opened/closed since the last run (baseline)
+- Check multiple hosts via an input file (or stdin) of hostnames(and ports), processed in parallel
+- Network (CIDR) targets, i.e. 10.20.0.0/22:22,443, optionally sharded across worker processes
+- Optional liveness pre-pass (ICMP, TCP, ARP) so ports on dead hosts are never checked
+- UDP mode, protocol payloads for well known ports, ports classified open, closed or open|filtered
+- Watch mode (availability monitor), per host:port connect latency histograms exported as
+  a Prometheus textfile or JSON snapshot
+- Asynchronous (or threaded) to improve performance for large number of ports
+- Python API, scan() / async_scan() generate structured results (no console output)
 
 **Usage**:
 
-    port-check [-h] [-i filename] [-c] [-w secs] [-v] [-o] [connection]
+    port-check [-h] [-i filename] [-c] [-w secs] [-e engine] [-m num] [-p num] [-H num] [-P num] [-r num] [-l] [-u] [-s] [-a] [-W secs] [--metrics filename] [-v] [-o] [connection]
 
     - -h: show help screen
     - -i: hosts list in filename provided
     - -c: list common port numbers and descriptions
     - -w: number of seconds to wait for connection
+    - -e: scan engine, async (default) or thread
+    - -m: max concurrent connections (default 500)
+    - -p: max concurrent connections per host (default -m value)
+    - -H: max host lines processed in parallel (default 20)
+    - -P: worker processes host lines are sharded across, 0 is one per CPU (default 1)
+    - -r: max new connections per second, 0 is unlimited (default 0)
+    - -l: liveness pre-pass, hosts (multi-host runs) that do not respond are skipped
+    - -u: check UDP ports (async engine, not Windows), replies/ICMP unreachables classify open, closed or open|filtered
+    - -s: identify service on open ports (async engine)
+    - --first_open: stop checking a host after the first open port (not in diff mode)
+    - --max_open: stop checking a host after num open ports (not in diff mode)
+    - -a: adaptive wait, derived per host from measured connect RTT (-w becomes the ceiling)
+    - --dns_ttl: seconds a resolved hostname is cached (default 300)
+    - -d: diff mode, only report ports opened/closed since the last (baseline) run
+    - --recheck_changed: in diff mode, re-verify changed ports before reporting them
+    - --baseline: baseline file (default ~/.IpHelper/PortCheckBaseline.json)
+    - -W: watch mode, re-run the checks every secs seconds until interrupted
+    - --metrics: write up state and latency histograms after each run (.json for JSON, else Prometheus textfile)
     - -v: verbose logging
     - -o: only show open connections
-    - connenction: target in format hostname:port (see below)
+    - connenction: target in format hostname:port or network:port (see below)
 
     The port parameter can be one (or a combination) of below formats:
 
@@ -27,9 +54,27 @@ This module checks for open[/closed] ports on target host(s).
     - 20-40       check for open ports 20 thru 40 on myHost
     - 80,20-44    check for open ports 80 and 20 thru 44 on myHost
     - common      the string, check for all common ports
+
+    The host may be an IPv4 network in CIDR notation (i.e. 10.20.0.0/22:22,443), each
+    host address in the network is checked (addresses are not reverse resolved).
         
     Connection strings may also be loaded into a text file to be processed by
-    using the -i command line parameter.
+    using the -i command line parameter (use '-i -' to read from stdin).  Host lines 
+    are processed in parallel, output is displayed in input order.  With -P, host lines
+    are sharded across worker processes (each running its own scan engine), connection
+    limits (-m, -H, -r) are totals split across the processes.
+
+**Python API**::
+
+    from dt_tools.cli.port_check_cli import HostResult, PortResult, ScanOptions, scan
+
+    for event in scan(['myHost:common', '10.20.0.0/24:22,443'], ScanOptions(only_open=True)):
+        if isinstance(event, PortResult) and event.is_open:
+            print(event.host, event.port, event.service)
+        elif isinstance(event, HostResult):
+            print(event.host_line, event.status, event.open_ports)
+
+    async_scan() is the async generator equivalent, for use on a running event loop.
 
 **Returns**:
     
@@ -39,14 +84,37 @@ This module checks for open[/closed] ports on target host(s).
     - 1-999   the number of un-successful connections
     - 1000+   parameter or data issue, see console message
 
+    In diff (-d) mode:
+
+    - 0       no changes since last run
+    - 1-999   the number of ports that opened or closed
+    - 1000+   parameter or data issue, see console message
+
 """
 import argparse
+import asyncio
+import bisect
+import collections
 import concurrent.futures
+import contextlib
+import dataclasses
+import datetime
+import errno
+import ipaddress
+import json
+import os
 import pathlib
+import queue
+import signal
+import socket
+import ssl
+import struct
 import sys
 import textwrap
 import threading
-from typing import List
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Set, Tuple, Union
 
 from loguru import logger as LOGGER
 
@@ -57,9 +125,613 @@ from dt_tools.os.project_helper import ProjectHelper
 from dt_tools.console.console_helper import ConsoleHelper as console
 from dt_tools.console.console_helper import ColorFG, TextStyle
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 stop_event = threading.Event()
 
+PORT_CHECK_BASELINE_LOCATION = pathlib.Path('~').expanduser().absolute() / ".IpHelper" / "PortCheckBaseline.json"
+
+ENGINES = ['async', 'thread']
+_MAX_THREADS = 30
+_MAX_THREAD_HOSTS = 8
+_REPORT_WINDOW = 2 # Host line reports in flight (running, or held behind the oldest) per concurrent host
+_SHARD_SIZE = 32  # Host lines per unit of work sent to a worker process
+_LIVE_BATCH = 256 # Host lines per liveness pre-pass batch
+# Liveness pre-pass, any answer (accepted or refused) on these ports means the host is up
+_LIVE_PORTS = (80, 443, 22, 445, 3389)
+_MIN_PORT = 1
+_MAX_PORT = 65535
+_FD_RESERVE = 64  # File descriptors held back from scan connections
+# OS resource exhaustion, connect is retried after a backoff rather than reported closed
+_RESOURCE_ERRNOS = {errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.EADDRNOTAVAIL}
+# Checked before the rest of a port spec
+_PRIORITY_PORTS = frozenset(net_helper.COMMON_PORTS.values())
+# Service probe: TLS handshake on these ports, other silent ports get an HTTP HEAD
+_TLS_PORTS = frozenset([443, 465, 563, 636, 853, 989, 990, 992, 993, 994, 995, 5061, 8443])
+_MAX_SERVICE_LEN = 60
+# UDP mode: probe payloads for well known ports (a reply means open), other ports get an empty datagram
+_UDP_PAYLOADS: Dict[int, bytes] = {
+    53: b'\x70\x63\x01\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00\x00\x02\x00\x01',  # DNS, root NS query
+    69: b'\x00\x01port-check\x00octet\x00',                                           # TFTP, read request
+    123: b'\x1b' + b'\x00' * 47,                                                        # NTP, v3 client request
+    137: b'\x80\xf0\x00\x10\x00\x01\x00\x00\x00\x00\x00\x00\x20CK' + b'A' * 30 + b'\x00\x00\x21\x00\x01',  # NetBIOS, NBSTAT
+    161: b'\x30\x26\x02\x01\x00\x04\x06public\xa0\x19\x02\x01\x01\x02\x01\x00\x02\x01\x00'    # SNMP v1, get sysDescr.0
+         b'\x30\x0e\x30\x0c\x06\x08\x2b\x06\x01\x02\x01\x01\x01\x00\x05\x00',
+    514: b'<14>port-check: probe',                                                     # Syslog, never replies
+    1900: b'M-SEARCH * HTTP/1.1\r\nHOST: 239.255.255.250:1900\r\nMAN: "ssdp:discover"\r\nMX: 1\r\nST: ssdp:all\r\n\r\n',
+    5353: b'\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x09_services\x07_dns-sd\x04_udp\x05local\x00\x00\x0c\x00\x01',
+}
+_UDP_SOCKETS = 2  # UDP sockets per host, probes for all ports are multiplexed on these
+_UDP_RETRIES = 1  # Probes re-sent when no reply (datagrams may be lost)
+# Linux reports ICMP errors for unconnected UDP sockets on the socket error queue
+_IP_RECVERR = getattr(socket, 'IP_RECVERR', 11) if sys.platform.startswith('linux') else None
+# Connect latency histogram bucket upper bounds (seconds), Prometheus style
+_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+@dataclass
+class ScanOptions():
+    wait: float = 1.0           # Seconds to wait for connection
+    only_open: bool = False     # Only display open ports
+    engine: str = 'async'       # Scan engine, async or thread
+    protocol: str = 'tcp'       # Port protocol, tcp or udp (async engine)
+    max_concurrent: int = 500   # Max connections in flight (all hosts)
+    max_per_host: int = None    # Max connections in flight per host (None = max_concurrent)
+    max_hosts: int = 20         # Max host lines processed in parallel
+    processes: int = 1          # Worker processes host lines are sharded across
+    rate: float = 0             # Max new connections per second, all hosts (0 = unlimited)
+    max_open: int = 0           # Stop checking a host after max_open open ports (0 = unlimited)
+    live_check: bool = False    # Liveness pre-pass, skip hosts that do not respond (multi-host runs)
+    probe: bool = False         # Identify service on open ports (async engine)
+    probe_wait: float = 1.0     # Seconds allowed for all service probe steps on a connection
+    adaptive: bool = False      # Derive wait from measured RTT (wait is the ceiling)
+    rtt_multiplier: float = 4.0 # Adaptive wait is a multiple of the smoothed RTT
+    min_wait: float = 0.1       # Adaptive wait floor
+    dns_ttl: float = 300.0      # Seconds a host name resolution is cached
+    baseline: '_Baseline' = None  # Diff mode, report changes against this baseline
+    recheck_changed: bool = False # Diff mode, re-verify changed ports before reporting
+    recheck_attempts: int = 2     # Number of re-verify attempts per changed port
+    on_result: 'ResultHandler' = None # Additional callback for each port result
+
+    @property
+    def per_host_limit(self) -> int:
+        if self.max_per_host is None:
+            return self.max_concurrent
+        return min(self.max_per_host, self.max_concurrent)
+
+
+@dataclass
+class PortResult():
+    """Result of a port check."""
+    host: str                   # Host as specified by user
+    port: int                   # Port number
+    is_open: bool               # Connection successful
+    elapsed: float = None       # Seconds to connect (or fail)
+    service: str = None         # Service identification (banner) if probed
+    state: str = None           # UDP, open, closed, filtered or open|filtered
+
+ResultHandler = Callable[[PortResult], None]
+
+
+@dataclass
+class HeaderLine():
+    """Header (## text) line from the host lines."""
+    text: str
+
+
+@dataclass
+class HostStart():
+    """Port checks for a host are starting."""
+    host: str                   # Host as specified by user
+    address: str                # IP address connected to
+    ports: str                  # Port specification (compiled, i.e. 20-25,80)
+    num_ports: int              # Number of ports to check
+    workers: int                # Concurrent checks for the host
+
+
+@dataclass
+class HostResult():
+    """
+    Host line complete.  Status is one of complete, invalid (host line), unresolved
+    (hostname), no_ports (invalid port parameter), down (liveness pre-pass) or error
+    (check failed unexpectedly).
+    """
+    host_line: str              # Host line as specified by user
+    host: str = None
+    address: str = None
+    ports: str = None           # Port specification (compiled, or as specified if invalid)
+    status: str = 'complete'
+    num_ports: int = 0          # Number of ports checked
+    open_ports: List[int] = dataclasses.field(default_factory=list)
+    changes: Dict[int, str] = dataclasses.field(default_factory=dict)  # Diff mode, port: opened|closed
+    baseline_created: bool = False  # Diff mode, no baseline existed for host:ports
+    error: str = None           # Status error, the exception raised checking the host
+    ret_cd: int = 0             # Unsuccessful connections (diff mode: changes), 1000+ for invalid host lines
+
+ScanEvent = Union[HeaderLine, HostStart, PortResult, HostResult]
+EventHandler = Callable[[ScanEvent], None]
+
+
+@dataclass
+class _HostTarget():
+    host_line: str              # Host line (or header/comment line) from connection or input file
+    literal: bool = False       # Host is an address expanded from a network, used as is (no lookup)
+    alive: bool = None          # Liveness pre-pass result (None = not checked)
+
+
+@dataclass
+class _ShardResult():
+    ret_cd: int = 0
+    log_lines: List[Tuple[str, str]] = dataclasses.field(default_factory=list)  # (level, message)
+    events: List[ScanEvent] = dataclasses.field(default_factory=list)
+    baseline_updates: Dict[str, dict] = dataclasses.field(default_factory=dict)
+
+
+class _PortSpec():
+    """
+    Compiled port specification.
+
+    Held as a sorted list of non-overlapping (first, last) port ranges, so duplicate
+    and overlapping entries (i.e. 80,1-1000) are checked once.  Ports are generated
+    lazily in ascending order.
+    """
+    def __init__(self, ranges: Iterable[Tuple[int, int]] = (), protocol: str = 'tcp'):
+        self.protocol = protocol
+        merged: List[Tuple[int, int]] = []
+        for first, last in sorted(ranges):
+            if merged and first <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+            else:
+                merged.append((first, last))
+        self._ranges = merged
+        self._firsts = [first for first, _ in merged]
+        self._len = sum([last - first + 1 for first, last in merged])
+
+    def __iter__(self) -> Iterator[int]:
+        for first, last in self._ranges:
+            yield from range(first, last + 1)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __contains__(self, port: int) -> bool:
+        idx = bisect.bisect_right(self._firsts, port) - 1
+        return idx >= 0 and port <= self._ranges[idx][1]
+
+    def __repr__(self) -> str:
+        spec = ','.join([str(first) if first == last else f'{first}-{last}' for first, last in self._ranges])
+        return spec if self.protocol == 'tcp' else f'{spec}/{self.protocol}'
+
+    def prioritized(self, priority_ports: Iterable[int] = _PRIORITY_PORTS) -> Iterator[int]:
+        """Generate ports in priority_ports first (ascending), then the remaining ports."""
+        first = sorted([port for port in set(priority_ports) if port in self])
+        yield from first
+        first_set = set(first)
+        for port in self:
+            if port not in first_set:
+                yield port
+
+
+class _OpenPortLimit():
+    """
+    Count open ports found on a host, stop once max_open (0 = unlimited) is reached.
+    """
+    def __init__(self, max_open: int = 0):
+        self._lock = threading.Lock()
+        self._max_open = max_open
+        self.open_cnt = 0
+        self.stopped = False
+
+    def accept(self, result: 'PortResult') -> bool:
+        """Returns False if the limit was reached before result arrived (result is discarded)."""
+        with self._lock:
+            if self.stopped:
+                return False
+            if result.is_open:
+                self.open_cnt += 1
+                self.stopped = self._max_open > 0 and self.open_cnt >= self._max_open
+        return True
+
+
+class _Baseline():
+    """
+    Last known open ports for each host:port-spec, persisted as json between runs.
+    """
+    def __init__(self, filename: pathlib.Path = PORT_CHECK_BASELINE_LOCATION):
+        self._lock = threading.Lock()
+        self.filename = pathlib.Path(filename)
+        self._entries: Dict[str, dict] = {}
+        self._updates: Dict[str, dict] = {}  # Entries updated this run
+        if self.filename.exists():
+            LOGGER.debug(f'loading baseline: {self.filename}')
+            self._entries = json.loads(self.filename.read_text())
+
+    @staticmethod
+    def key(host: str, ports: _PortSpec) -> str:
+        return f'{host.lower()}:{ports!r}'
+
+    def get(self, host: str, ports: _PortSpec) -> Set[int]:
+        """Return open ports from last run, or None if no baseline exists"""
+        with self._lock:
+            entry = self._entries.get(self.key(host, ports))
+        return None if entry is None else set(entry['open'])
+
+    def update(self, host: str, ports: _PortSpec, open_ports: Set[int]):
+        entry = {
+            'open': sorted(open_ports), 
+            'modified': datetime.datetime.now().isoformat(timespec='seconds')
+        }
+        self.merge({self.key(host, ports): entry})
+
+    def merge(self, updates: Dict[str, dict]):
+        with self._lock:
+            self._entries.update(updates)
+            self._updates.update(updates)
+
+    def take_updates(self) -> Dict[str, dict]:
+        """Return (and forget) entries updated since the last call, used to merge worker process updates."""
+        with self._lock:
+            updates = self._updates
+            self._updates = {}
+        return updates
+
+    def save(self) -> bool:
+        success = True
+        if self._updates:
+            try:
+                self.filename.parent.mkdir(parents=True, exist_ok=True)
+                self.filename.write_text(json.dumps(self._entries, indent=2))
+                LOGGER.debug(f'{len(self._entries)} baseline entries saved to {self.filename}')
+            except Exception as ex:
+                LOGGER.error(f'Unable to save baseline {self.filename} - {repr(ex)}')
+                success = False
+        return success
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+@dataclass
+class _PortMetrics():
+    host: str
+    port: int
+    protocol: str
+    up: bool = False            # Open at the last check
+    checks: int = 0             # Number of checks
+    open_checks: int = 0        # Number of checks the port was open
+    buckets: List[int] = dataclasses.field(default_factory=lambda: [0] * (len(_LATENCY_BUCKETS) + 1))
+    latency_sum: float = 0.0    # Total connect seconds, open checks
+
+    def add(self, result: 'PortResult'):
+        self.checks += 1
+        self.up = result.is_open
+        if result.is_open and result.elapsed is not None:
+            self.open_checks += 1
+            self.buckets[bisect.bisect_left(_LATENCY_BUCKETS, result.elapsed)] += 1
+            self.latency_sum += result.elapsed
+
+    def cumulative_buckets(self) -> List[Tuple[str, int]]:
+        """Returns [(le, count)...] including +Inf"""
+        counts = []
+        total = 0
+        for bound, count in zip([*[str(bound) for bound in _LATENCY_BUCKETS], '+Inf'], self.buckets):
+            total += count
+            counts.append((bound, total))
+        return counts
+
+
+class _WatchMetrics():
+    """
+    Up state and connect latency histogram for each host:port, accumulated in memory
+    across watch mode runs.  Written as a Prometheus textfile (node exporter textfile 
+    collector) or, for a .json filename, a JSON snapshot.
+    """
+    def __init__(self, filename: pathlib.Path = None, protocol: str = 'tcp'):
+        self._lock = threading.Lock()
+        self.filename = None if filename is None else pathlib.Path(filename)
+        self._protocol = protocol
+        self._ports: Dict[Tuple[str, int], _PortMetrics] = {}
+        self.runs = 0
+        self.last_run: datetime.datetime = None
+
+    def add(self, result: 'PortResult'):
+        key = (result.host, result.port)
+        with self._lock:
+            metrics = self._ports.get(key)
+            if metrics is None:
+                metrics = _PortMetrics(result.host, result.port, self._protocol)
+                self._ports[key] = metrics
+            metrics.add(result)
+
+    def run_complete(self):
+        with self._lock:
+            self.runs += 1
+            self.last_run = datetime.datetime.now()
+
+    def write(self) -> bool:
+        if self.filename is None:
+            return True
+        with self._lock:
+            if self.filename.suffix.lower() == '.json':
+                content = json.dumps(self._json_snapshot(), indent=2)
+            else:
+                content = self._prometheus_text()
+        try:
+            # Replaced atomically, a collector never reads a partial file
+            self.filename.parent.mkdir(parents=True, exist_ok=True)
+            tmp_filename = self.filename.with_name(f'.{self.filename.name}.tmp')
+            tmp_filename.write_text(content)
+            os.replace(tmp_filename, self.filename)
+        except OSError as ex:
+            LOGGER.error(f'Unable to write metrics {self.filename} - {repr(ex)}')
+            return False
+        LOGGER.debug(f'{len(self._ports)} port metrics written to {self.filename}')
+        return True
+
+    def _json_snapshot(self) -> dict:
+        return {
+            'generated': None if self.last_run is None else self.last_run.isoformat(timespec='seconds'),
+            'runs': self.runs,
+            'ports': [{
+                'host': metrics.host, 'port': metrics.port, 'protocol': metrics.protocol,
+                'up': metrics.up, 'checks': metrics.checks, 'open_checks': metrics.open_checks,
+                'latency': {
+                    'buckets': dict(metrics.cumulative_buckets()),
+                    'sum': round(metrics.latency_sum, 6),
+                    'count': metrics.open_checks
+                }
+            } for metrics in self._ports.values()]
+        }
+
+    def _prometheus_text(self) -> str:
+        lines = [
+            '# HELP port_check_up Port open (1) or not (0) at the last check.',
+            '# TYPE port_check_up gauge',
+        ]
+        for metrics in self._ports.values():
+            lines.append(f'port_check_up{{{self._labels(metrics)}}} {int(metrics.up)}')
+        lines.extend(['# HELP port_check_checks_total Number of checks.', '# TYPE port_check_checks_total counter'])
+        for metrics in self._ports.values():
+            lines.append(f'port_check_checks_total{{{self._labels(metrics)}}} {metrics.checks}')
+        lines.extend(['# HELP port_check_connect_seconds Connect latency of checks that found the port open.', 
+                      '# TYPE port_check_connect_seconds histogram'])
+        for metrics in self._ports.values():
+            labels = self._labels(metrics)
+            for bound, count in metrics.cumulative_buckets():
+                lines.append(f'port_check_connect_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'port_check_connect_seconds_sum{{{labels}}} {metrics.latency_sum:.6f}')
+            lines.append(f'port_check_connect_seconds_count{{{labels}}} {metrics.open_checks}')
+        if self.last_run is not None:
+            lines.extend(['# HELP port_check_last_run_timestamp_seconds Completion time of the last run.',
+                          '# TYPE port_check_last_run_timestamp_seconds gauge',
+                          f'port_check_last_run_timestamp_seconds {self.last_run.timestamp():.0f}'])
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _labels(metrics: _PortMetrics) -> str:
+        host = metrics.host.replace('\\', '\\\\').replace('"', '\\"')
+        return f'host="{host}",port="{metrics.port}",protocol="{metrics.protocol}"'
+
+
+class _DnsCache():
+    """
+    In-process cache of host name resolution, shared across ports and host lines.
+
+    Each host is resolved once (concurrent requests for the same host wait on the
+    first lookup), the address is used for all connects.  Entries, including
+    failed lookups, expire after ttl seconds.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[float, str]] = {}
+        self._host_locks: Dict[str, threading.Lock] = {}
+
+    def resolve(self, host: str, ttl: float = 300.0) -> str:
+        """
+        Return the IP address for host, or None if host is not valid/resolvable.
+        """
+        key = host.lower()
+        with self._lock:
+            host_lock = self._host_locks.setdefault(key, threading.Lock())
+        with host_lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                LOGGER.trace(f'dns cache hit: {host} -> {entry[1]}')
+                return entry[1]
+            address = self._lookup(host)
+            self._entries[key] = (time.monotonic() + ttl, address)
+        return address
+
+    @staticmethod
+    def _lookup(host: str) -> str:
+        # Same validity rules as net_helper.is_valid_host(), but returns the address to connect to
+        if 'unknown' in host.lower():
+            LOGGER.error(f'invalid hostname: {host}')
+            return None
+        try:
+            if net_helper.is_valid_ipaddress(host):
+                LOGGER.debug(f'dns lookup - check via IP addr: {host}')
+                _ = socket.gethostbyaddr(host)
+                address = host
+            else:
+                LOGGER.debug(f'dns lookup - check via hostname: {host}')
+                address = socket.gethostbyname(host)
+        except (socket.gaierror, socket.herror, UnicodeError):
+            address = None
+        return address
+
+_DNS_CACHE = _DnsCache()
+
+
+class _Pacer():
+    """
+    Pace new connections across all hosts.
+
+    A token bucket caps connects per second (rate 0 is unlimited), callers reserve
+    a token and wait until it is due.  When the OS reports resource exhaustion
+    (EMFILE, ENOBUFS, ...) all new connects pause for an exponential backoff.
+    """
+    _BACKOFF_MIN = 0.05
+    _BACKOFF_MAX = 2.0
+
+    def __init__(self, rate: float = 0):
+        self._lock = threading.Lock()
+        self._rate = rate
+        self._burst = max(1.0, rate / 10) # 100ms worth of connects
+        self._tokens = self._burst
+        self._last = time.monotonic()
+        self._resume_at = 0.0
+        self._backoff = 0.0
+        self.backoff_cnt = 0
+
+    async def wait(self):
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def wait_sync(self):
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def backoff(self, ex: OSError):
+        with self._lock:
+            self.backoff_cnt += 1
+            now = time.monotonic()
+            if now < self._resume_at:
+                return # Already paused, errors from connects started before the pause
+            self._backoff = min(self._BACKOFF_MAX, max(self._BACKOFF_MIN, self._backoff * 2))
+            self._resume_at = now + self._backoff
+        LOGGER.debug(f'connect resource error ({errno.errorcode.get(ex.errno, ex.errno)}), pause {self._backoff:.2f}s')
+
+    def success(self):
+        if self._backoff > 0:
+            with self._lock:
+                self._backoff = 0.0
+
+    def _reserve(self) -> float:
+        """Reserve a connect, returns seconds to wait before connecting"""
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self._resume_at - now)
+            if self._rate > 0:
+                self._tokens = min(self._burst, self._tokens + (now - self._last) * self._rate)
+                self._last = now
+                self._tokens -= 1
+                if self._tokens < 0:
+                    delay = max(delay, -self._tokens / self._rate)
+        return delay
+
+
+class _RttTracker():
+    """
+    Track connect handshake round-trip times for a host and derive the wait used
+    for subsequent connects.  
+    
+    Smoothed RTT and variance are computed as in RFC 6298.  Both accepted (SYN-ACK)
+    and refused (RST) connects are valid samples.  Until the first sample arrives,
+    or if adaptive is off, the configured wait is used.
+    """
+    def __init__(self, wait: float, adaptive: bool = False, multiplier: float = 4.0, min_wait: float = 0.1):
+        self._lock = threading.Lock()
+        self._max_wait = wait
+        self._adaptive = adaptive
+        self._multiplier = multiplier
+        self._min_wait = min_wait
+        self.srtt: float = None
+        self.rttvar: float = None
+        self.samples = 0
+
+    @property
+    def wait(self) -> float:
+        if not self._adaptive or self.srtt is None:
+            return self._max_wait
+        adaptive_wait = max(self._multiplier * self.srtt, self.srtt + 4 * self.rttvar, self._min_wait)
+        return min(adaptive_wait, self._max_wait)
+
+    def add_sample(self, rtt: float):
+        with self._lock:
+            if self.srtt is None:
+                self.srtt = rtt
+                self.rttvar = rtt / 2
+            else:
+                self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+                self.srtt = 0.875 * self.srtt + 0.125 * rtt
+            self.samples += 1
+
+    @classmethod
+    def for_options(cls, options: 'ScanOptions') -> '_RttTracker':
+        return cls(options.wait, options.adaptive, options.rtt_multiplier, options.min_wait)
+
+    def log_summary(self, host: str):
+        if self._adaptive and self.srtt is not None:
+            LOGGER.debug(f'{host} srtt {self.srtt*1000:.2f}ms ({self.samples} samples), adaptive wait {self.wait:.3f}s')
+
+
+class _Report():
+    """
+    Events for a host line.  Events are passed to the sink immediately, or held (buffered)
+    until the report is released so a host's events are delivered as a group.
+    """
+    def __init__(self, sink: EventHandler, buffered: bool = False):
+        self._lock = threading.Lock()
+        self._sink = sink
+        self._buffered = buffered
+        self._events: List[ScanEvent] = []
+        self.complete = False
+
+    def emit(self, event: ScanEvent):
+        with self._lock:
+            if self._buffered:
+                self._events.append(event)
+            else:
+                self._sink(event)
+
+    def release(self):
+        with self._lock:
+            for event in self._events:
+                self._sink(event)
+            self._events.clear()
+            self._buffered = False
+
+
+class _OrderedReports():
+    """
+    Release host line reports in input order.  The oldest unfinished report
+    streams live, later reports are buffered until it completes.  on_release is
+    called as each report is released, engines use it to bound the reports in
+    flight (so a slow host never holds an unbounded number of buffered reports).
+    """
+    def __init__(self, sink: EventHandler, on_release: Callable[[], None] = None):
+        self._lock = threading.Lock()
+        self._sink = sink
+        self._on_release = on_release
+        self._pending: collections.deque[_Report] = collections.deque()
+
+    def new_report(self) -> _Report:
+        with self._lock:
+            report = _Report(self._sink, buffered=len(self._pending) > 0)
+            self._pending.append(report)
+        return report
+
+    def set_complete(self, report: _Report):
+        with self._lock:
+            report.complete = True
+            while self._pending and self._pending[0].complete:
+                self._pending.popleft().release()
+                if self._on_release is not None:
+                    self._on_release()
+            if self._pending:
+                self._pending[0].release()
+
 def _sub_list(in_list: list, cols: int) -> list:
     final = [in_list[i * cols:(i + 1) * cols] for i in range((len(in_list) + cols - 1) // cols )] 
     return final
@@ -80,37 +752,521 @@ def _list_common_ports():
         port3   = f'{item[2][1]:5d}'.lstrip('0') if len(item) > 2 else ''
         LOGGER.info(f'  {port1:5} {p1_name:20}  {port2:5} {p2_name:20}  {port3:5} {p3_name:20}')
 
-def _process_host_file(input_filename: str, wait: float = 1.0, only_open: bool = False) -> int:
+def _read_host_lines(input_filename: str) -> Iterator[str]:
+    if input_filename == '-':
+        for host_line in sys.stdin:
+            yield host_line.rstrip('\r\n')
+    else:
+        with open(pathlib.Path(input_filename), mode="r") as in_file:
+            for host_line in in_file:
+                yield host_line.rstrip('\r\n')
+
+def _process_host_file(input_filename: str, options: ScanOptions = None) -> int:
     LOGGER.debug(f'_process_host_file() - {input_filename}')
-    fn = pathlib.Path(input_filename)
-    with open(fn, mode="r") as in_file:
-        host_list = in_file.read().splitlines()
-    
+    if options is None:
+        options = ScanOptions()
+    return _render_scan(scan(_read_host_lines(input_filename), options), options)
+
+def scan(connections: Union[str, Iterable[str]], options: ScanOptions = None) -> Iterator[ScanEvent]:
+    """
+    Check ports, generating structured results (no console output).
+
+    Arguments:
+        connections: A connection string (host:ports, network:ports) or host lines
+          (i.e. an open host file), read lazily.
+
+    Keyword Arguments:
+        options: Scan options (default: {ScanOptions()}).
+
+    Returns:
+        Iterator of events, in host line order: HeaderLine, then for each host line
+        HostStart (if ports are checked), a PortResult per port checked and a HostResult.
+
+    Raises:
+        ValueError: options combine diff mode (baseline) with an open port limit (max_open),
+            or udp protocol on Windows.
+
+    Note:
+        The scan runs on a background thread, stopping iteration cancels the scan.
+    """
+    options = _fd_limited_options(_validate_options(ScanOptions() if options is None else options))
+    events = queue.SimpleQueue()
+    cancel_event = threading.Event() # Stops the thread engine and shard loop, task.cancel() can not
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(_async_run_scan(_to_host_lines(connections), options, events.put, cancel_event))
+
+    def _run():
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(task)
+        except BaseException:
+            pass # Raised to the caller below
+        try:
+            # As asyncio.run(), tasks left by a cancelled scan are cancelled before the loop is closed
+            pending = asyncio.all_tasks(loop)
+            for pending_task in pending:
+                pending_task.cancel()
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_default_executor())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+            events.put(None)
+
+    thread = threading.Thread(target=_run, name='port-check-scan', daemon=True)
+    thread.start()
+    try:
+        while (event := events.get()) is not None:
+            yield event
+        thread.join()
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+    finally:
+        if thread.is_alive():
+            cancel_event.set()
+            loop.call_soon_threadsafe(task.cancel)
+            thread.join()
+
+async def async_scan(connections: Union[str, Iterable[str]], options: ScanOptions = None) -> AsyncIterator[ScanEvent]:
+    """
+    Check ports on the running event loop, asynchronous version of scan().
+
+    Arguments:
+        connections: A connection string (host:ports, network:ports) or host lines.
+
+    Keyword Arguments:
+        options: Scan options (default: {ScanOptions()}).
+
+    Returns:
+        Async iterator of events, see scan().
+
+    Raises:
+        ValueError: invalid options, see scan().
+    """
+    options = _fd_limited_options(_validate_options(ScanOptions() if options is None else options))
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    cancel_event = threading.Event()
+
+    def _sink(event: ScanEvent):
+        # Events are emitted from the loop and from engine threads
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    task = asyncio.create_task(_async_run_scan(_to_host_lines(connections), options, _sink, cancel_event))
+    task.add_done_callback(lambda _: _sink(None))
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+        await task
+    finally:
+        if not task.done():
+            cancel_event.set()
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+def _to_host_lines(connections: Union[str, Iterable[str]]) -> Iterable[str]:
+    return [connections] if isinstance(connections, str) else connections
+
+async def _async_run_scan(host_lines: Iterable[str], options: ScanOptions, sink: EventHandler, 
+                          cancel_event: threading.Event = None) -> int:
+    """cancel_event stops scans run on threads (thread engine, shards), cancelling the task only stops the async engine."""
+    targets = _expand_host_lines(host_lines)
+    if options.processes > 1:
+        return await asyncio.to_thread(_sharded_process_host_lines, targets, options, sink, cancel_event)
+    if _use_thread_engine(options):
+        return await asyncio.to_thread(_thread_process_host_lines, targets, options, sink, cancel_event)
+    return await _async_process_host_lines(targets, options, sink)
+
+def _parse_network(host_line: str) -> ipaddress.IPv4Network:
+    """Return the network if host line targets an IPv4 network (CIDR), else None"""
+    tokens = host_line.split(':')
+    if len(tokens) != 2 or '/' not in tokens[0]:
+        return None
+    try:
+        return ipaddress.IPv4Network(tokens[0].strip(), strict=False)
+    except ValueError:
+        return None
+
+def _expand_host_lines(host_lines: Iterable[str]) -> Iterator[_HostTarget]:
+    """Generate a target per host line, network host lines are expanded (lazily) to a target per address."""
+    for host_line in host_lines:
+        network = _parse_network(host_line) if _is_host_line(host_line) else None
+        if network is None:
+            yield _HostTarget(host_line)
+        else:
+            ports = host_line.split(':')[1]
+            LOGGER.debug(f'{network} expanded to {max(network.num_addresses - 2, 1)} hosts')
+            for address in network.hosts():
+                yield _HostTarget(f'{address}:{ports}', literal=True)
+
+def _is_header_line(host_line: str) -> bool:
+    return host_line.startswith("##")
+
+def _is_host_line(host_line: str) -> bool:
+    return not host_line.startswith("#") and len(host_line.strip()) > 0
+
+def _live_targets(targets: Iterator[_HostTarget], options: ScanOptions, pacer: _Pacer = None) -> Iterator[_HostTarget]:
+    """
+    Liveness pre-pass.  Targets are probed in batches (while the previous batch is 
+    being scanned), each target is marked alive or not before its ports are scheduled.
+    Probes are paced by the scan's pacer (shared with the port connects).
+    """
+    if pacer is None:
+        pacer = _Pacer(options.rate)
+    batch: List[_HostTarget] = []
+    for target in targets:
+        batch.append(target)
+        if len(batch) == _LIVE_BATCH:
+            asyncio.run(_async_check_live_batch(batch, options, pacer))
+            yield from batch
+            batch = []
+    if batch:
+        asyncio.run(_async_check_live_batch(batch, options, pacer))
+        yield from batch
+
+async def _async_check_live_batch(batch: List[_HostTarget], options: ScanOptions, pacer: _Pacer):
+    limit = asyncio.Semaphore(options.max_concurrent)
+
+    async def _check(target: _HostTarget) -> str:
+        # Returns address of a host that did not respond
+        tokens = target.host_line.split(':')
+        if _is_header_line(target.host_line) or not _is_host_line(target.host_line) or len(tokens) != 2:
+            return None
+        address = tokens[0] if target.literal else await asyncio.to_thread(_DNS_CACHE.resolve, tokens[0], options.dns_ttl)
+        if address is None:
+            return None # Reported when the host line is processed
+        target.alive = await _async_is_host_alive(address, options.wait, limit, pacer)
+        return None if target.alive else address
+
+    no_response = await asyncio.gather(*[_check(target) for target in batch])
+    # Probes above trigger ARP resolution, a host on the local segment may answer ARP but drop IP probes
+    local_addresses = {address for address in no_response if address is not None and net_helper.is_ip_local(address)}
+    if local_addresses:
+        arp_addresses = local_addresses & await asyncio.to_thread(_arp_cache_addresses)
+        for target, address in zip(batch, no_response):
+            if address in arp_addresses:
+                target.alive = True
+    LOGGER.debug(f'liveness pre-pass: {len([t for t in batch if t.alive])} of {len(batch)} lines alive')
+
+async def _async_is_host_alive(address: str, wait: float, limit: asyncio.Semaphore, pacer: _Pacer) -> bool:
+    probes = [asyncio.create_task(_async_tcp_ping(address, port, wait, limit, pacer)) for port in _LIVE_PORTS]
+    probes.append(asyncio.create_task(_async_icmp_ping(address, wait, limit, pacer)))
+    try:
+        for probe in asyncio.as_completed(probes):
+            if await probe:
+                return True
+        return False
+    finally:
+        for probe in probes:
+            probe.cancel()
+
+async def _async_tcp_ping(address: str, port: int, wait: float, limit: asyncio.Semaphore, pacer: _Pacer) -> bool:
+    async with limit:
+        loop = asyncio.get_running_loop()
+        while True:
+            await pacer.wait()
+            sock = None
+            try:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.setblocking(False)
+                await asyncio.wait_for(loop.sock_connect(sock, (address, port)), timeout=wait)
+                alive = True
+            except ConnectionRefusedError:
+                alive = True
+            except asyncio.TimeoutError:
+                alive = False
+            except OSError as ex:
+                # Resource exhaustion (EMFILE, ENOBUFS, ...) says nothing about the host, back off and retry
+                if ex.errno in _RESOURCE_ERRNOS:
+                    pacer.backoff(ex)
+                    continue
+                alive = False
+            finally:
+                if sock is not None:
+                    sock.close()
+            pacer.success()
+            return alive
+
+async def _async_icmp_ping(address: str, wait: float, limit: asyncio.Semaphore, pacer: _Pacer) -> bool:
+    async with limit:
+        loop = asyncio.get_running_loop()
+        ident = os.getpid() & 0xFFFF
+        while True:
+            await pacer.wait()
+            try:
+                sock = _icmp_socket()
+            except OSError as ex:
+                pacer.backoff(ex) # Resource exhaustion, back off and retry
+                continue
+            if sock is None:
+                return False
+            deadline = loop.time() + wait
+            try:
+                sock.setblocking(False)
+                sock.connect((address, 0))
+                await loop.sock_sendall(sock, _icmp_echo_request(ident))
+                while (reply := await _async_recv(sock, deadline)):
+                    if sock.type == socket.SOCK_RAW:
+                        # Raw socket replies include the IP header, and any ICMP traffic
+                        reply = reply[(reply[0] & 0x0F) * 4:]
+                        if len(reply) >= 8 and reply[0] == 0 and struct.unpack('!H', reply[4:6])[0] == ident:
+                            return True
+                    elif len(reply) >= 8 and reply[0] == 0:
+                        return True
+            except OSError as ex:
+                if ex.errno in _RESOURCE_ERRNOS:
+                    pacer.backoff(ex)
+                    continue
+                LOGGER.trace(f'{address} icmp probe failed - {repr(ex)}')
+            finally:
+                sock.close()
+            pacer.success()
+            return False
+
+_ICMP_PERMITTED = True
+_ICMP_NOT_PERMITTED_ERRNOS = {errno.EPERM, errno.EACCES, errno.EPROTONOSUPPORT}
+
+def _icmp_socket() -> socket.socket:
+    """
+    Unprivileged (datagram) ICMP socket if permitted by the OS, else raw socket (root), else None.
+    ICMP is disabled for the process only when the OS does not permit it, resource exhaustion
+    (EMFILE, ENOBUFS, ...) raises OSError.
+    """
+    global _ICMP_PERMITTED
+    if _ICMP_PERMITTED:
+        errors: List[OSError] = []
+        for sock_type in [socket.SOCK_DGRAM, socket.SOCK_RAW]:
+            try:
+                return socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+            except OSError as ex:
+                if ex.errno in _RESOURCE_ERRNOS:
+                    raise
+                errors.append(ex)
+        if all(ex.errno in _ICMP_NOT_PERMITTED_ERRNOS for ex in errors):
+            LOGGER.debug('ICMP sockets not permitted, liveness pre-pass uses TCP/ARP only')
+            _ICMP_PERMITTED = False
+        else:
+            LOGGER.trace(f'Unable to open ICMP socket - {repr(errors[-1])}')
+    return None
+
+def _icmp_echo_request(ident: int, seq: int = 1) -> bytes:
+    payload = b'port-check'
+    header = struct.pack('!BBHHH', 8, 0, 0, ident, seq)
+    checksum = 0
+    data = header + payload
+    for idx in range(0, len(data), 2):
+        checksum += (data[idx] << 8) + (data[idx + 1] if idx + 1 < len(data) else 0)
+    checksum = (checksum >> 16) + (checksum & 0xFFFF)
+    checksum = ~(checksum + (checksum >> 16)) & 0xFFFF
+    return struct.pack('!BBHHH', 8, 0, checksum, ident, seq) + payload
+
+def _arp_cache_addresses() -> Set[str]:
+    try:
+        return {client.ip for client in net_helper.get_lan_clients_from_ARP_cache()}
+    except Exception as ex:
+        LOGGER.debug(f'Unable to read ARP cache - {repr(ex)}')
+        return set()
+
+def _thread_process_host_lines(targets: Iterator[_HostTarget], options: ScanOptions, sink: EventHandler,
+                               cancel_event: threading.Event = None) -> int:
+    pacer = _Pacer(options.rate)
+    if options.live_check:
+        targets = _live_targets(targets, options, pacer)
+    host_cnt = min(options.max_hosts, _MAX_THREAD_HOSTS)
+    report_slots = threading.BoundedSemaphore(host_cnt * _REPORT_WINDOW)
+    reports = _OrderedReports(sink, report_slots.release)
+    global_limit = threading.BoundedSemaphore(options.max_concurrent)
+    host_slots = threading.BoundedSemaphore(host_cnt)
+    futures: List[concurrent.futures.Future] = []
+    ret_cd = 0
+
+    def _run(target: _HostTarget, report: _Report) -> int:
+        try:
+            return _thread_process_host_connection(target.host_line, options, report, global_limit, pacer, 
+                                                   target.literal, target.alive is not False, cancel_event)
+        except Exception as ex:
+            return _host_error_result(target.host_line, report, ex)
+        finally:
+            reports.set_complete(report)
+            host_slots.release()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=host_cnt) as executor:
+        for target in targets:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            if _is_header_line(target.host_line):
+                report_slots.acquire()
+                report = reports.new_report()
+                report.emit(HeaderLine(target.host_line.replace("##","").strip()))
+                reports.set_complete(report)
+            elif _is_host_line(target.host_line):
+                report_slots.acquire()
+                host_slots.acquire()
+                futures.append(executor.submit(_run, target, reports.new_report()))
+                # Drop finished futures so memory stays flat for large host lists
+                running = []
+                for future in futures:
+                    if future.done():
+                        ret_cd += future.result()
+                    else:
+                        running.append(future)
+                futures = running
+
+    return ret_cd + sum([future.result() for future in futures])
+
+async def _async_process_host_lines(targets: Iterator[_HostTarget], options: ScanOptions, sink: EventHandler) -> int:
+    pacer = _Pacer(options.rate)
+    if options.live_check:
+        targets = _live_targets(targets, options, pacer)
+    report_slots = asyncio.Semaphore(options.max_hosts * _REPORT_WINDOW)
+    reports = _OrderedReports(sink, report_slots.release)
+    global_limit = asyncio.Semaphore(options.max_concurrent)
+    host_slots = asyncio.Semaphore(options.max_hosts)
+    pending = set()
+    ret_cd = 0
+
+    async def _run(target: _HostTarget, report: _Report) -> int:
+        try:
+            return await _async_process_host_connection(target.host_line, options, report, global_limit, pacer, 
+                                                        target.literal, target.alive is not False)
+        except Exception as ex:
+            return _host_error_result(target.host_line, report, ex)
+        finally:
+            reports.set_complete(report)
+            host_slots.release()
+
+    def _task_done(task: asyncio.Task):
+        nonlocal ret_cd
+        pending.discard(task)
+        if not task.cancelled():
+            ret_cd += task.result()
+
+    try:
+        # Host lines are pulled lazily (stdin may be a slow producer) so the scan never waits on input
+        while (target := await asyncio.to_thread(next, targets, None)) is not None:
+            if _is_header_line(target.host_line):
+                await report_slots.acquire()
+                report = reports.new_report()
+                report.emit(HeaderLine(target.host_line.replace("##","").strip()))
+                reports.set_complete(report)
+            elif _is_host_line(target.host_line):
+                # A slow host blocks scheduling once the report window is full, held reports stay bounded
+                await report_slots.acquire()
+                await host_slots.acquire()
+                task = asyncio.create_task(_run(target, reports.new_report()))
+                pending.add(task)
+                task.add_done_callback(_task_done)
+
+        if pending:
+            await asyncio.wait(pending)
+    finally:
+        # Scan cancelled (i.e. async_scan() consumer stopped), hosts in flight are abandoned
+        for task in list(pending):
+            task.cancel()
+    return ret_cd
+
+def _sharded_process_host_lines(targets: Iterator[_HostTarget], options: ScanOptions, sink: EventHandler,
+                                cancel_event: threading.Event = None) -> int:
+    """
+    Shard targets across worker processes, each shard is scanned by the worker's own
+    engine.  Shard events are merged in input order.
+    """
+    shard_options = dataclasses.replace(options, processes=1, on_result=None,
+                                        max_concurrent=max(1, options.max_concurrent // options.processes),
+                                        max_hosts=max(1, options.max_hosts // options.processes),
+                                        rate=options.rate / options.processes)
+    LOGGER.debug(f'sharding across {options.processes} processes, {shard_options.max_concurrent} concurrent connections each')
+    in_flight: collections.deque[concurrent.futures.Future] = collections.deque()
     ret_cd = 0
-    for host_line in host_list:
-        if host_line.startswith("##"):
-            LOGGER.info(host_line.replace("##","").strip())
-        elif not host_line.startswith("#") and host_line.strip():
-            ret_cd += _process_host_connection(host_line, wait, only_open)
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=options.processes, initializer=_init_shard_worker,
+                                                      initargs=(shard_options,))
+    try:
+        shard: List[_HostTarget] = []
+        for target in targets:
+            shard.append(target)
+            if len(shard) == _SHARD_SIZE:
+                in_flight.append(executor.submit(_process_shard, shard))
+                shard = []
+            # Bound the shards in flight so large networks are never fully expanded
+            if len(in_flight) > options.processes * 2:
+                ret_cd += _merge_shard_result(_shard_result(in_flight.popleft(), cancel_event), options, sink)
+        if shard:
+            in_flight.append(executor.submit(_process_shard, shard))
+        while in_flight:
+            ret_cd += _merge_shard_result(_shard_result(in_flight.popleft(), cancel_event), options, sink)
+    except BaseException:
+        # Shards in flight would run to completion, only this executor's workers are terminated
+        # (other child processes belong to the caller)
+        workers = list((executor._processes or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for proc in workers:
+            if proc.is_alive():
+                proc.terminate()
+        raise
+    executor.shutdown()
 
     return ret_cd
 
-def _extract_ports(ports_string: str) -> List[int]:
+def _shard_result(future: concurrent.futures.Future, cancel_event: threading.Event = None) -> _ShardResult:
+    """Wait for a shard, raises CancelledError if the scan is cancelled first."""
+    while not future.done():
+        if cancel_event is not None and cancel_event.is_set():
+            raise concurrent.futures.CancelledError()
+        concurrent.futures.wait([future], timeout=0.1)
+    return future.result()
+
+def _merge_shard_result(shard_result: _ShardResult, options: ScanOptions, sink: EventHandler) -> int:
+    for level, msg in shard_result.log_lines:
+        LOGGER.log(level, msg)
+    for event in shard_result.events:
+        if options.on_result is not None and isinstance(event, PortResult):
+            options.on_result(event)
+        sink(event)
+    if options.baseline is not None:
+        options.baseline.merge(shard_result.baseline_updates)
+    return shard_result.ret_cd
+
+_SHARD_OPTIONS: ScanOptions = None
+_SHARD_LOG: List[Tuple[str, str]] = []
+
+def _init_shard_worker(options: ScanOptions):
+    global _SHARD_OPTIONS
+    # Ctrl-C is handled by the parent process, log output is captured and returned with the shard result
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    LOGGER.remove()
+    LOGGER.add(lambda message: _SHARD_LOG.append((message.record['level'].name, message.record['message'])), 
+               level='TRACE', format='{message}')
+    _SHARD_OPTIONS = options
+
+def _process_shard(shard: List[_HostTarget]) -> _ShardResult:
+    options = _SHARD_OPTIONS
+    events: List[ScanEvent] = []
+    _SHARD_LOG.clear()
+    if _use_thread_engine(options):
+        ret_cd = _thread_process_host_lines(iter(shard), options, events.append)
+    else:
+        ret_cd = asyncio.run(_async_process_host_lines(iter(shard), options, events.append))
+    baseline_updates = {} if options.baseline is None else options.baseline.take_updates()
+    return _ShardResult(ret_cd, list(_SHARD_LOG), events, baseline_updates)
+
+def _extract_ports(ports_string: str, protocol: str = 'tcp') -> _PortSpec:
     if ports_string == 'common':
         ports_list = net_helper.COMMON_PORTS.values()
     else:
         ports_list = ports_string.split(',')
     
-    ports = []
+    ranges: List[Tuple[int, int]] = []
     for port in ports_list:
-        # Expand ranges if there are any
+        # Collect ranges, expansion is deferred to _PortSpec iteration
         if isinstance(port, int):
-            ports.append(port)
+            ranges.append((port, port))
         else:
             token = port.split('-')
             if len(token) == 1:
                 if token[0].isdigit():
-                    ports.append(int(token[0]))
+                    ranges.append((int(token[0]), int(token[0])))
                 else:
                     LOGGER.warning(f'{token[0]} Dropped.  Port must be numeric')
             elif len(token) == 2:
@@ -121,71 +1277,655 @@ def _extract_ports(ports_string: str) -> List[int]:
                     LOGGER.warning(f'{port} Dropped.  Non-numeric port parameter')
                 else:
                     if b_port < e_port:
-                        ports.extend(list(range(int(token[0]), int(token[1])+1)))
+                        ranges.append((b_port, e_port))
                     else:
                         LOGGER.warning(f'{port} Dropped. Invalid port range')
 
-    return ports
+    valid_ranges = []
+    for b_port, e_port in ranges:
+        if b_port < _MIN_PORT or e_port > _MAX_PORT:
+            LOGGER.warning(f'{b_port if b_port == e_port else f"{b_port}-{e_port}"} Dropped.  Port must be {_MIN_PORT}-{_MAX_PORT}')
+        else:
+            valid_ranges.append((b_port, e_port))
+
+    return _PortSpec(valid_ranges, protocol)
 
-def _process_host_connection(host_connection: str, wait: float = 1.0, only_open: bool = False) -> int:
+def _process_host_connection(host_connection: str, options: ScanOptions = None) -> int:
     LOGGER.debug(f'_process_host_connection() - {host_connection}')    
+    if options is None:
+        options = ScanOptions()
+    return _render_scan(scan(host_connection, options), options)
+
+def _use_thread_engine(options: ScanOptions) -> bool:
+    # UDP probes are only implemented by the async engine
+    return options.engine == 'thread' and options.protocol == 'tcp'
+
+def _validate_options(options: ScanOptions) -> ScanOptions:
+    if options.baseline is not None and options.max_open > 0:
+        # A host stopped at the open port limit is partially checked, unchecked ports would be reported closed
+        raise ValueError('max_open can not be used in diff mode (baseline)')
+    if options.protocol == 'udp' and sys.platform == 'win32':
+        # UDP replies are read with loop.add_reader(), not supported by the Windows (proactor) event loop
+        raise ValueError('udp protocol is not supported on Windows')
+    return options
+
+def _fd_limited_options(options: ScanOptions) -> ScanOptions:
+    """Clamp max concurrent connections to the process open file (descriptor) limit."""
+    if resource is None:
+        return options
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    needed = options.max_concurrent + _FD_RESERVE
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        new_soft = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (new_soft, hard))
+            LOGGER.debug(f'open file limit raised from {soft} to {new_soft}')
+            soft = new_soft
+        except (ValueError, OSError) as ex:
+            LOGGER.debug(f'Unable to raise open file limit - {repr(ex)}')
+    if soft != resource.RLIM_INFINITY and options.max_concurrent > soft - _FD_RESERVE:
+        max_concurrent = max(1, soft - _FD_RESERVE)
+        LOGGER.warning(f'Max concurrent connections reduced to {max_concurrent} (open file limit {soft}).')
+        options = dataclasses.replace(options, max_concurrent=max_concurrent)
+    return options
+
+def _prepare_host_connection(host_connection: str, options: ScanOptions, 
+                             literal: bool = False) -> Tuple[HostResult, str, str, _PortSpec]:
+    """
+    Validate host line, returns (error, host, address, ports).  error is None for a valid
+    host line.  A literal host is used as the address.
+    """
     tokens = host_connection.split(':')
     if len(tokens) != 2:
-        LOGGER.info('')
-        LOGGER.warning(f'Invalid host line - {host_connection}')
-        return 1000
+        return HostResult(host_connection, status='invalid', ret_cd=1000), None, None, _PortSpec()
     
     host = tokens[0]
-    if not net_helper.is_valid_host(host):
-        LOGGER.info('')
-        LOGGER.warning(f'{host:20} invalid, could not resolve hostname - BYPASS')
-        return 1001
+    address = host if literal else _DNS_CACHE.resolve(host, options.dns_ttl)
+    if address is None:
+        return HostResult(host_connection, host, status='unresolved', ret_cd=1001), host, None, _PortSpec()
     
-    ports = _extract_ports(tokens[1])
+    ports = _extract_ports(tokens[1], options.protocol)
     if len(ports) == 0:
-        LOGGER.info('')
-        LOGGER.warning(f'Invalid ports parameter: {tokens[1]}')
-        return 1002
-    
-    ret_cd = 0        
-    display_closed = not only_open
+        return HostResult(host_connection, host, address, tokens[1], status='no_ports', ret_cd=1002), host, address, ports
+
+    return None, host, address, ports
+
+def _host_down_result(host_connection: str, host: str, address: str, ports: _PortSpec, options: ScanOptions) -> HostResult:
+    """Host did not respond to the liveness pre-pass, none of its ports are checked."""
+    LOGGER.debug(f'{host} down, {len(ports)} ports skipped')
+    # Diff mode, baseline is left as is (state of a down host is unknown)
+    return HostResult(host_connection, host, address, repr(ports), status='down', 
+                      ret_cd=0 if options.baseline is not None else len(ports))
+
+def _host_error_result(host_connection: str, report: _Report, ex: Exception) -> int:
+    """Host check raised, the host line is reported as an error so the scan carries on."""
+    LOGGER.debug(f'{host_connection} check failed - {repr(ex)}')
+    result = HostResult(host_connection, status='error', error=repr(ex), ret_cd=1003)
+    report.emit(result)
+    return result.ret_cd
+
+def _result_handler(options: ScanOptions, report: _Report, open_ports: Set[int]) -> ResultHandler:
+    def _on_result(result: PortResult):
+        if result.is_open:
+            open_ports.add(result.port)
+        if options.on_result is not None:
+            options.on_result(result)
+        report.emit(result)
+
+    return _on_result
+
+def _thread_process_host_connection(host_connection: str, options: ScanOptions, report: _Report, 
+                                    global_limit: threading.Semaphore = None, pacer: _Pacer = None,
+                                    literal: bool = False, alive: bool = True, 
+                                    cancel_event: threading.Event = None) -> int:
+    error, host, address, ports = _prepare_host_connection(host_connection, options, literal)
+    if error is None and not alive:
+        error = _host_down_result(host_connection, host, address, ports, options)
+    if error is not None:
+        report.emit(error)
+        return error.ret_cd
+
     num_ports = len(ports)
-    futures = []
-    thread_cnt = min(num_ports, 30) # Limit thread count to 30 max
+    thread_cnt = min(num_ports, _MAX_THREADS, options.per_host_limit) # Limit thread count to 30 max
+    report.emit(HostStart(host, address, repr(ports), num_ports, thread_cnt))
+    open_ports: Set[int] = set()
+    on_result = _result_handler(options, report, open_ports)
+    ret_cd = _thread_scan_ports(host, address, ports, thread_cnt, options, on_result, global_limit, pacer, cancel_event)
+    result = HostResult(host_connection, host, address, repr(ports), num_ports=num_ports, 
+                        open_ports=sorted(open_ports), ret_cd=ret_cd)
+    if options.baseline is not None:
+        flapping = set()
+        known_ports = options.baseline.get(host, ports)
+        if known_ports is not None and options.recheck_changed:
+            flapping = {port for port in open_ports ^ known_ports 
+                        if not _confirm_port_state(address, port, port in open_ports, options)}
+        _apply_baseline(result, ports, open_ports, flapping, options)
+
+    report.emit(result)
+    return result.ret_cd
+
+async def _async_process_host_connection(host_connection: str, options: ScanOptions, report: _Report, 
+                                         global_limit: asyncio.Semaphore = None, pacer: _Pacer = None,
+                                         literal: bool = False, alive: bool = True) -> int:
+    error, host, address, ports = await asyncio.to_thread(_prepare_host_connection, host_connection, options, literal)
+    if error is None and not alive:
+        error = _host_down_result(host_connection, host, address, ports, options)
+    if error is not None:
+        report.emit(error)
+        return error.ret_cd
+
+    num_ports = len(ports)
+    report.emit(HostStart(host, address, repr(ports), num_ports, min(num_ports, options.per_host_limit)))
+    open_ports: Set[int] = set()
+    on_result = _result_handler(options, report, open_ports)
+    if pacer is None:
+        pacer = _Pacer(options.rate)
+    ret_cd = await _async_scan_ports(host, address, ports, options, on_result, global_limit, pacer)
+    result = HostResult(host_connection, host, address, repr(ports), num_ports=num_ports, 
+                        open_ports=sorted(open_ports), ret_cd=ret_cd)
+    if options.baseline is not None:
+        flapping = set()
+        known_ports = options.baseline.get(host, ports)
+        if known_ports is not None and options.recheck_changed:
+            changed = sorted(open_ports ^ known_ports)
+            confirmed = await asyncio.gather(*[_async_confirm_port_state(address, port, port in open_ports, options, pacer) 
+                                               for port in changed])
+            flapping = {port for port, port_confirmed in zip(changed, confirmed) if not port_confirmed}
+        _apply_baseline(result, ports, open_ports, flapping, options)
+
+    report.emit(result)
+    return result.ret_cd
+
+def _thread_scan_ports(host: str, address: str, ports: _PortSpec, thread_cnt: int, options: ScanOptions, 
+                       on_result: ResultHandler, global_limit: threading.Semaphore = None, pacer: _Pacer = None,
+                       cancel_event: threading.Event = None) -> int:
+    ret_cd = 0        
+    limit = contextlib.nullcontext() if global_limit is None else global_limit
+    rtt = _RttTracker.for_options(options)
+    open_limit = _OpenPortLimit(options.max_open)
+    if pacer is None:
+        pacer = _Pacer(options.rate)
+    if cancel_event is None:
+        cancel_event = threading.Event()
+
+    def _check_port(port: int) -> int:
+        if open_limit.stopped or cancel_event.is_set():
+            return 0
+        with limit:
+            pacer.wait_sync()
+            result = _check_host(host, port, options.wait, rtt, address)
+        if not open_limit.accept(result):
+            return 0
+        on_result(result)
+        return 0 if result.is_open else 1
+
+    # Submission is bounded, results are consumed as they complete
+    max_pending = thread_cnt * 2
+    pending = set()
     with concurrent.futures.ThreadPoolExecutor(max_workers=thread_cnt) as executor:
-        if num_ports > thread_cnt:
-            LOGGER.info('')
-            dsply_ports = console.cwrap(num_ports, fg=ColorFG.WHITE2, style=TextStyle.BOLD)
-            dsply_host = console.cwrap(host, fg=ColorFG.WHITE2, style=TextStyle.BOLD)
-            LOGGER.info(f'Checking {dsply_ports} ports on {dsply_host} with {executor._max_workers} threads.')
-            LOGGER.info('')
-        future:concurrent.futures.Future = None
-        for port in ports:
-            future = executor.submit(_check_host, host, port, wait, display_closed)
-            futures.append(future)
-        for future in futures:
+        for port in ports.prioritized():
+            if len(pending) >= max_pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                ret_cd += sum([future.result() for future in done])
+            if open_limit.stopped or cancel_event.is_set():
+                break
+            pending.add(executor.submit(_check_port, port))
+        for future in concurrent.futures.as_completed(pending):
             ret_cd += future.result()
-        if ret_cd == num_ports:
-            LOGGER.warning('  No open ports detected.')
+    if open_limit.stopped:
+        LOGGER.debug(f'{host} stopped after {open_limit.open_cnt} open ports.')
+    rtt.log_summary(host)
     return ret_cd
 
-def _check_host(host: str, port: int, wait: float = 1.5, display_closed: bool = True) -> int:
-    host_id = f'{host}:{port}'
+async def _async_scan_ports(host: str, address: str, ports: _PortSpec, options: ScanOptions, 
+                            on_result: ResultHandler, global_limit: asyncio.Semaphore, pacer: _Pacer) -> int:
+    limit = contextlib.nullcontext() if global_limit is None else global_limit
+    rtt = _RttTracker.for_options(options)
+    open_limit = _OpenPortLimit(options.max_open)
+    port_iter = ports.prioritized()
+    workers: List[asyncio.Task] = []
+    udp = _UdpProber(address) if ports.protocol == 'udp' else None
+    ret_cd = 0
+
+    # A fixed set of workers (the per-host limit) pull from the shared port iterator
+    async def _worker():
+        nonlocal ret_cd
+        for port in port_iter:
+            async with limit:
+                if udp is not None:
+                    result = await udp.probe(host, port, rtt.wait, pacer)
+                else:
+                    result = await _async_tcp_check(host, address, port, options, rtt, pacer)
+            if not open_limit.accept(result):
+                break
+            on_result(result)
+            ret_cd += 0 if result.is_open else 1
+            if open_limit.stopped:
+                # Limit reached, abandon connects in flight on the other workers
+                for worker in workers:
+                    if worker is not asyncio.current_task():
+                        worker.cancel()
+                LOGGER.debug(f'{host} stopped after {open_limit.open_cnt} open ports.')
+                break
+
+    worker_cnt = min(len(ports), options.per_host_limit)
+    workers.extend([asyncio.create_task(_worker()) for _ in range(worker_cnt)])
+    try:
+        await asyncio.wait(workers)
+    finally:
+        for worker in workers:
+            worker.cancel()
+        if udp is not None:
+            udp.close()
+    for worker in workers:
+        if not worker.cancelled() and worker.exception() is not None:
+            raise worker.exception()
+    rtt.log_summary(host)
+    return ret_cd
+
+async def _async_tcp_check(host: str, address: str, port: int, options: ScanOptions, 
+                           rtt: _RttTracker, pacer: _Pacer) -> PortResult:
+    service = None
+    sock, elapsed = await _async_paced_connect(address, port, rtt, pacer)
+    if sock is not None:
+        try:
+            if options.probe:
+                service = await _async_identify_service(sock, host, port, options.probe_wait)
+        finally:
+            sock.close()
+    return PortResult(host, port, sock is not None, elapsed, service)
+
+async def _async_paced_connect(address: str, port: int, rtt: _RttTracker, pacer: _Pacer) -> Tuple[socket.socket, float]:
+    """
+    Connect once paced, retried after a backoff on resource exhaustion.  Returns (socket, elapsed), 
+    elapsed is the final connect only (as the thread engine, pacing and backoff are not included).
+    """
+    while True:
+        await pacer.wait()
+        start = time.perf_counter()
+        try:
+            sock = await _async_connect(address, port, rtt.wait, rtt)
+        except OSError as ex:
+            if ex.errno not in _RESOURCE_ERRNOS:
+                raise
+            pacer.backoff(ex)
+        else:
+            pacer.success()
+            return sock, time.perf_counter() - start
+
+async def _async_paced_is_port_open(address: str, port: int, rtt: _RttTracker, pacer: _Pacer) -> bool:
+    sock, _ = await _async_paced_connect(address, port, rtt, pacer)
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+async def _async_connect(host: str, port: int, wait: float = 1.0, rtt: _RttTracker = None) -> socket.socket:
+    """Returns connected (non-blocking) socket, caller must close.  None if port is not open."""
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    start = loop.time()
+    try:
+        await asyncio.wait_for(loop.sock_connect(sock, (host, port)), timeout=wait)
+        if rtt is not None:
+            rtt.add_sample(loop.time() - start)
+        return sock
+    except ConnectionRefusedError:
+        if rtt is not None:
+            rtt.add_sample(loop.time() - start)
+    except asyncio.TimeoutError:
+        pass
+    except OSError as ex:
+        if ex.errno in _RESOURCE_ERRNOS:
+            sock.close()
+            raise
+    except BaseException:
+        sock.close()
+        raise
+    sock.close()
+    return None
+
+async def _async_identify_service(sock: socket.socket, host: str, port: int, probe_wait: float) -> str:
+    """
+    Identify service on an established connection within probe_wait seconds.
+
+    TLS ports get a handshake (and HTTP HEAD over TLS), other ports are given
+    a chance to send a banner (SSH, FTP, SMTP, ...), silent ports get an HTTP HEAD.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + probe_wait
+    service = None
+    try:
+        if port in _TLS_PORTS:
+            service = await _async_tls_probe(sock, host, deadline)
+        else:
+            banner = await _async_recv(sock, loop.time() + probe_wait / 2)
+            if not banner:
+                await loop.sock_sendall(sock, _http_head_request(host))
+                banner = await _async_recv(sock, deadline)
+            service = _describe_banner(banner)
+    except (OSError, ssl.SSLError) as ex:
+        LOGGER.trace(f'{host}:{port} service probe failed - {repr(ex)}')
+
+    return service
+
+async def _async_recv(sock: socket.socket, deadline: float) -> bytes:
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(loop.sock_recv(sock, 4096), timeout=max(0, deadline - loop.time()))
+    except asyncio.TimeoutError:
+        return b''
+
+async def _async_tls_probe(sock: socket.socket, host: str, deadline: float) -> str:
+    loop = asyncio.get_running_loop()
+    incoming = ssl.MemoryBIO()
+    outgoing = ssl.MemoryBIO()
+    server_hostname = None if net_helper.is_valid_ipaddress(host) else host
+    tls = _tls_probe_context().wrap_bio(incoming, outgoing, server_hostname=server_hostname)
+
+    async def _tls_call(func: Callable, *args):
+        # Drive the TLS object over the socket until func completes, None on deadline/EOF
+        while True:
+            try:
+                return func(*args)
+            except ssl.SSLWantReadError:
+                if outgoing.pending:
+                    await loop.sock_sendall(sock, outgoing.read())
+                data = await _async_recv(sock, deadline)
+                if not data:
+                    return None
+                incoming.write(data)
+            finally:
+                if outgoing.pending:
+                    await loop.sock_sendall(sock, outgoing.read())
+
+    if await _tls_call(tls.do_handshake) is None and tls.version() is None:
+        return None
+    service = tls.version()
+    tls.write(_http_head_request(host))
+    reply = await _tls_call(tls.read, 4096)
+    if reply:
+        service = f'{service} {_describe_banner(reply)}'
+    return service
+
+_TLS_PROBE_CONTEXT: ssl.SSLContext = None
+
+def _tls_probe_context() -> ssl.SSLContext:
+    global _TLS_PROBE_CONTEXT
+    if _TLS_PROBE_CONTEXT is None:
+        # Identification only, certificates are not verified
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        _TLS_PROBE_CONTEXT = context
+    return _TLS_PROBE_CONTEXT
+
+def _http_head_request(host: str) -> bytes:
+    return f'HEAD / HTTP/1.0\r\nHost: {host}\r\nUser-Agent: port-check\r\n\r\n'.encode('ascii', errors='ignore')
+
+def _describe_banner(banner: bytes) -> str:
+    if not banner:
+        return None
+    if len(banner) > 2 and banner[0] in (0x15, 0x16) and banner[1] == 0x03:
+        return 'TLS'
+    lines = banner.decode('latin-1').splitlines()
+    first_line = ''.join([ch for ch in lines[0] if ch.isprintable()]).strip() if lines else ''
+    if first_line.startswith('HTTP/'):
+        server = [line.split(':', 1)[1].strip() for line in lines if line.lower().startswith('server:')]
+        if server:
+            first_line = f'{first_line} ({server[0]})'
+    if len(first_line) == 0:
+        return None
+    return first_line[:_MAX_SERVICE_LEN]
+
+class _UdpProber():
+    """
+    UDP probes for a host, multiplexed on a small set of (unconnected) sockets.
+
+    A reply from the probed port means open.  ICMP port unreachable means closed,
+    other ICMP unreachables filtered (Linux only, read from the socket error queue).
+    No answer after retries is open|filtered.  Probes are paced with the TCP connects.
+    """
+    def __init__(self, address: str, num_sockets: int = _UDP_SOCKETS):
+        self._loop = asyncio.get_running_loop()
+        self._address = address
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._sockets: List[socket.socket] = []
+        for _ in range(num_sockets):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+            if _IP_RECVERR is not None:
+                sock.setsockopt(socket.IPPROTO_IP, _IP_RECVERR, 1)
+            self._loop.add_reader(sock.fileno(), self._on_readable, sock)
+            self._sockets.append(sock)
+
+    async def probe(self, host: str, port: int, wait: float, pacer: _Pacer) -> PortResult:
+        sock = self._sockets[port % len(self._sockets)]
+        payload = _UDP_PAYLOADS.get(port, b'')
+        start = time.perf_counter()
+        state = 'open|filtered'
+        for _ in range(1 + _UDP_RETRIES):
+            await pacer.wait()
+            future = self._loop.create_future()
+            self._pending[port] = future
+            try:
+                self._send(sock, payload, port)
+                state = await asyncio.wait_for(future, timeout=wait)
+                break
+            except asyncio.TimeoutError:
+                pass
+            except ConnectionError:
+                pass # ICMP error for an earlier probe reported on send, probe is re-sent
+            except OSError as ex:
+                if ex.errno not in _RESOURCE_ERRNOS:
+                    raise
+                pacer.backoff(ex)
+            finally:
+                self._pending.pop(port, None)
+        return PortResult(host, port, state == 'open', time.perf_counter() - start, state=state)
+
+    def close(self):
+        for sock in self._sockets:
+            self._loop.remove_reader(sock.fileno())
+            sock.close()
+        self._sockets.clear()
+
+    def _send(self, sock: socket.socket, payload: bytes, port: int):
+        try:
+            sock.sendto(payload, (self._address, port))
+        except ConnectionError:
+            # An ICMP error for an earlier probe is reported on the next send, re-send once
+            self._drain_errors(sock)
+            sock.sendto(payload, (self._address, port))
+
+    def _on_readable(self, sock: socket.socket):
+        while True:
+            try:
+                _, (address, port) = sock.recvfrom(4096)
+            except BlockingIOError:
+                break
+            except OSError:
+                # ICMP error pending on the socket, details are on the error queue
+                break
+            if address == self._address:
+                self._resolve(port, 'open')
+        self._drain_errors(sock)
+
+    def _drain_errors(self, sock: socket.socket):
+        if _IP_RECVERR is None:
+            return
+        while True:
+            try:
+                _, ancdata, _, (address, port) = sock.recvmsg(512, 512, socket.MSG_ERRQUEUE)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                break
+            for level, cmsg_type, cmsg_data in ancdata:
+                if level == socket.IPPROTO_IP and cmsg_type == _IP_RECVERR and address == self._address:
+                    ee_errno = struct.unpack('=I', cmsg_data[:4])[0]
+                    self._resolve(port, 'closed' if ee_errno == errno.ECONNREFUSED else 'filtered')
+
+    def _resolve(self, port: int, state: str):
+        future = self._pending.get(port)
+        if future is not None and not future.done():
+            future.set_result(state)
+
+
+def _check_host(host: str, port: int, wait: float = 1.5, rtt: _RttTracker = None, address: str = None) -> PortResult:
+    if rtt is not None:
+        wait = rtt.wait
+    start = time.perf_counter()
+    port_open = net_helper.is_port_open(host if address is None else address, port, wait)
+    elapsed = time.perf_counter() - start
+    # is_port_open() does not expose the failure reason, a fast failure is treated as refused (RST)
+    if rtt is not None and (port_open or elapsed < wait * 0.9):
+        rtt.add_sample(elapsed)
+    return PortResult(host, port, port_open, elapsed)
+
+def _confirm_port_state(address: str, port: int, expect_open: bool, options: ScanOptions) -> bool:
+    for _ in range(options.recheck_attempts):
+        if net_helper.is_port_open(address, port, options.wait) != expect_open:
+            return False
+    return True
+
+async def _async_confirm_port_state(address: str, port: int, expect_open: bool, options: ScanOptions, pacer: _Pacer) -> bool:
+    rtt = _RttTracker(options.wait)
+    udp = _UdpProber(address, num_sockets=1) if options.protocol == 'udp' else None
+    try:
+        for _ in range(options.recheck_attempts):
+            if udp is not None:
+                port_open = (await udp.probe(address, port, options.wait, pacer)).is_open
+            else:
+                port_open = await _async_paced_is_port_open(address, port, rtt, pacer)
+            if port_open != expect_open:
+                return False
+    finally:
+        if udp is not None:
+            udp.close()
+    return True
+
+def _apply_baseline(result: HostResult, ports: _PortSpec, open_ports: Set[int], flapping: Set[int], options: ScanOptions):
+    """Diff mode, set result changes (ret_cd is the number of changes) and update the baseline."""
+    host = result.host
+    known_ports = options.baseline.get(host, ports)
+    if known_ports is None:
+        options.baseline.update(host, ports, open_ports)
+        result.baseline_created = True
+        result.ret_cd = 0
+        return
+    
+    confirmed_open = set(open_ports)
+    for port in flapping:
+        LOGGER.debug(f'{host}:{port} state not confirmed on recheck (flapping), change ignored.')
+        if port in open_ports:
+            confirmed_open.discard(port)
+        else:
+            confirmed_open.add(port)
+
+    result.changes = {port: 'opened' if port in confirmed_open else 'closed' for port in sorted(confirmed_open ^ known_ports)}
+    result.open_ports = sorted(confirmed_open)
+    result.ret_cd = len(result.changes)
+    options.baseline.update(host, ports, confirmed_open)
+
+def _port_name(port: int) -> str:
     port_name = net_helper.get_port_name(port)
-    if port_name is None:
-        port_name = ''
-    if net_helper.is_port_open(host, port, wait):
-        ret_cd = 0
-        status = console.cwrap('open  ', fg=ColorFG.GREEN2, style=[TextStyle.BOLD])            
-        LOGGER.info(f'{host_id:20} {status} {port_name}')
-    else: 
-        ret_cd = 1
+    return '' if port_name is None else port_name
+
+def _render_scan(events: Iterable[ScanEvent], options: ScanOptions) -> int:
+    """Display scan events on the console, returns the scan return code."""
+    ret_cd = 0
+    for event in events:
+        if isinstance(event, PortResult):
+            if options.baseline is None:
+                _display_port_status(event, not options.only_open)
+        elif isinstance(event, HostResult):
+            _display_host_result(event, options)
+            ret_cd += event.ret_cd
+        elif isinstance(event, HostStart):
+            _display_scan_header(event, options)
+        elif isinstance(event, HeaderLine):
+            LOGGER.info(event.text)
+    return ret_cd
+
+def _display_scan_header(event: HostStart, options: ScanOptions):
+    if event.num_ports > event.workers and options.baseline is None:
+        worker_desc = 'threads' if _use_thread_engine(options) else 'concurrent connections'
+        LOGGER.info('')
+        dsply_ports = console.cwrap(event.num_ports, fg=ColorFG.WHITE2, style=TextStyle.BOLD)
+        dsply_host = console.cwrap(event.host, fg=ColorFG.WHITE2, style=TextStyle.BOLD)
+        LOGGER.info(f'Checking {dsply_ports} ports on {dsply_host} with {event.workers} {worker_desc}.')
+        LOGGER.info('')
+
+def _display_host_result(result: HostResult, options: ScanOptions):
+    if result.status == 'invalid':
+        LOGGER.info('')
+        LOGGER.warning(f'Invalid host line - {result.host_line}')
+    elif result.status == 'unresolved':
+        LOGGER.info('')
+        LOGGER.warning(f'{result.host:20} invalid, could not resolve hostname - BYPASS')
+    elif result.status == 'no_ports':
+        LOGGER.info('')
+        LOGGER.warning(f'Invalid ports parameter: {result.ports}')
+    elif result.status == 'error':
+        LOGGER.info('')
+        LOGGER.error(f'{result.host_line} check failed - {result.error}')
+    elif result.status == 'down':
+        if not options.only_open:
+            LOGGER.info('')
+            LOGGER.warning(f'{result.host:20} down, no response to liveness probe - BYPASS')
+    elif options.baseline is not None:
+        if result.baseline_created:
+            LOGGER.info(f'{result.host:20} baseline created, {len(result.open_ports)} open ports.')
+        for port, change in result.changes.items():
+            if change == 'opened':
+                status = console.cwrap('opened', fg=ColorFG.GREEN2, style=[TextStyle.BOLD])
+            else:
+                status = console.cwrap('closed', fg=ColorFG.YELLOW2, style=[TextStyle.BOLD])
+            LOGGER.info(f'{f"{result.host}:{port}":20} {status} {_port_name(port)}')
+    elif result.ret_cd == result.num_ports:
+        LOGGER.warning('  No open ports detected.')
+
+def _display_port_status(result: PortResult, display_closed: bool = True):
+    host_id = f'{result.host}:{result.port}' + ('' if result.state is None else '/udp')
+    port_name = _port_name(result.port)
+    if result.service is not None:
+        port_name = f'{port_name:20} {console.cwrap(result.service, fg=ColorFG.WHITE2)}'
+    if result.state in ['filtered', 'open|filtered']:
         if display_closed:
-            status = console.cwrap('closed', fg=ColorFG.YELLOW2, style=[TextStyle.BOLD])            
+            status = console.cwrap(result.state, fg=ColorFG.YELLOW2)
             LOGGER.info(f'{host_id:20} {status} {port_name}')
+    elif result.is_open:
+        status = console.cwrap('open  ', fg=ColorFG.GREEN2, style=[TextStyle.BOLD])            
+        LOGGER.info(f'{host_id:20} {status} {port_name}')
+    elif display_closed:
+        status = console.cwrap('closed', fg=ColorFG.YELLOW2, style=[TextStyle.BOLD])            
+        LOGGER.info(f'{host_id:20} {status} {port_name}')
 
+def _watch(run_checks: Callable[[], int], interval: float, options: ScanOptions, metrics: _WatchMetrics) -> int:
+    """Re-run checks every interval seconds (measured start to start) until stopped."""
+    ret_cd = 0
+    while not stop_event.is_set():
+        start = time.monotonic()
+        ret_cd = run_checks()
+        metrics.run_complete()
+        metrics.write()
+        if options.baseline is not None:
+            options.baseline.save()
+        elapsed = time.monotonic() - start
+        if elapsed > interval:
+            LOGGER.warning(f'Run {metrics.runs} took {elapsed:.1f}s, longer than the {interval}s watch interval.')
+        LOGGER.debug(f'run {metrics.runs} complete in {elapsed:.2f}s, ret_cd {ret_cd}')
+        stop_event.wait(max(0.0, interval - elapsed))
     return ret_cd
 
+def _signal_handler(signum, frame):
+    print('CTRL-C: Stopping after the run in progress, Ctrl-C again to abort...')
+    stop_event.set()
+    # Second Ctrl-C aborts
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
 def _validate_commandline_args(args: argparse.Namespace):
     ret_cd = 0
     if not args.common:
@@ -199,10 +1939,16 @@ def _validate_commandline_args(args: argparse.Namespace):
             if len(args.connection.split(':')) != 2:
                 LOGGER.error('Invalid parameters, must include host:port or host:common\n')
                 ret_cd = 3200
-        else: # must be input file
-            if not pathlib.Path(args.input).exists():
+        else: # must be input file (or stdin)
+            if args.input != '-' and not pathlib.Path(args.input).exists():
                 LOGGER.error(f'File not found - {args.input}')
                 ret_cd = 3300
+    if ret_cd == 0 and args.diff and (args.first_open or args.max_open > 0):
+        LOGGER.error('--first_open/--max_open can not be used in diff mode (-d), unchecked ports would be reported closed\n')
+        ret_cd = 3400
+    if ret_cd == 0 and args.udp and sys.platform == 'win32':
+        LOGGER.error('UDP mode (-u) is not supported on Windows\n')
+        ret_cd = 3500
 
     return ret_cd
 
@@ -221,11 +1967,15 @@ def main():
             20-40       check for open ports 20 thru 40 on myHost
             80,20-44    check for open ports 80 and 20 thru 44 on myHost
             common      the string, check for all common ports
+
+        The host may be an IPv4 network (CIDR), each address is checked:
+            {parser.prog} 10.20.0.0/22:22,443
         
         Connection strings may also be loaded into a text file to be processed by
-        using the -i command line parameter:
+        using the -i command line parameter (- for stdin):
         ------------------------------------------
             {parser.prog} -i my_hostlist.txt
+            cat my_hostlist.txt | {parser.prog} -i -
 
          ''') 
     parser.epilog = textwrap.dedent('''\
@@ -234,13 +1984,60 @@ def main():
             0       if all connections are successful
             1-999   the number of un-successful connections
             1000+   parameter or data issue, see console message
+
+            In diff (-d) mode (watch mode returns the last run)
+            0       no changes since last run
+            1-999   the number of ports that opened or closed
+            1000+   parameter or data issue, see console message
     ''')
     parser.add_argument('-i', '--input', type=str, required=False, metavar="filename",
-                            help='Input file containing connection definitions')
+                            help='Input file containing connection definitions (- for stdin)')
     parser.add_argument('-c', '--common', action='store_true', default=False,
                             help='List common ports and exit')
     parser.add_argument('-w', '--wait', type=float, required=False, default=1.0, metavar="secs",
                             help='Time to wait (default 1 second)')
+    parser.add_argument('-e', '--engine', choices=ENGINES, default='async',
+                            help='Scan engine (default async)')
+    parser.add_argument('-m', '--max_concurrent', type=int, required=False, default=500, metavar="num",
+                            help='Max concurrent connections (default 500)')
+    parser.add_argument('-p', '--per_host', type=int, required=False, default=None, metavar="num",
+                            help='Max concurrent connections per host (default -m value)')
+    parser.add_argument('-H', '--max_hosts', type=int, required=False, default=20, metavar="num",
+                            help='Max host lines processed in parallel (default 20)')
+    parser.add_argument('-P', '--processes', type=int, required=False, default=1, metavar="num",
+                            help='Worker processes host lines are sharded across, 0 is one per CPU (default 1)')
+    parser.add_argument('-r', '--rate', type=float, required=False, default=0, metavar="num",
+                            help='Max new connections per second, 0 is unlimited (default 0)')
+    parser.add_argument('-l', '--live_check', action='store_true', default=False,
+                            help='Liveness pre-pass (ICMP, TCP, ARP), skip hosts that do not respond (multi-host runs)')
+    parser.add_argument('-u', '--udp', action='store_true', default=False,
+                            help='Check UDP ports (async engine, not Windows), open, closed or open|filtered')
+    parser.add_argument('-s', '--service', action='store_true', default=False,
+                            help='Identify service on open ports, banner/HTTP/TLS probe (async engine)')
+    parser.add_argument('--probe_wait', type=float, required=False, default=1.0, metavar="secs",
+                            help='Seconds allowed for service identification per port (default 1.0)')
+    parser.add_argument('--first_open', action='store_true', default=False,
+                            help='Stop checking a host after the first open port')
+    parser.add_argument('--max_open', type=int, required=False, default=0, metavar="num",
+                            help='Stop checking a host after num open ports (default 0, no limit)')
+    parser.add_argument('-a', '--adaptive', action='store_true', default=False,
+                            help='Adaptive wait per host based on measured RTT, -w is the ceiling')
+    parser.add_argument('--rtt_multiplier', type=float, required=False, default=4.0, metavar="num",
+                            help='Adaptive wait as a multiple of measured RTT (default 4.0)')
+    parser.add_argument('--min_wait', type=float, required=False, default=0.1, metavar="secs",
+                            help='Adaptive wait floor (default 0.1 seconds)')
+    parser.add_argument('--dns_ttl', type=float, required=False, default=300.0, metavar="secs",
+                            help='Seconds a resolved hostname is cached (default 300)')
+    parser.add_argument('-d', '--diff', action='store_true', default=False,
+                            help='Only report ports opened/closed since last run')
+    parser.add_argument('--recheck_changed', action='store_true', default=False,
+                            help='Diff mode, re-verify changed ports before reporting')
+    parser.add_argument('--baseline', type=str, required=False, default=str(PORT_CHECK_BASELINE_LOCATION), metavar="filename",
+                            help='Diff mode baseline file (default ~/.IpHelper/PortCheckBaseline.json)')
+    parser.add_argument('-W', '--watch', type=float, required=False, default=0, metavar="secs",
+                            help='Watch mode, re-run the checks every secs seconds until interrupted')
+    parser.add_argument('--metrics', type=str, required=False, default=None, metavar="filename",
+                            help='Write up state/latency histograms after each run (.json, else Prometheus textfile)')
     parser.add_argument('-v', '--verbose', action='count', default=0,
                             help='-v:debug -vv:trace')
     parser.add_argument('-o', '--only_open', action='store_true', default=False,
@@ -271,10 +2068,42 @@ def main():
         _list_common_ports()
         return ret_cd
     
+    options = ScanOptions(wait=args.wait, only_open=args.only_open, 
+                           engine=args.engine, protocol='udp' if args.udp else 'tcp', 
+                           max_concurrent=max(args.max_concurrent, 1),
+                           max_per_host=None if args.per_host is None else max(args.per_host, 1),
+                           max_hosts=max(args.max_hosts, 1), rate=max(args.rate, 0),
+                           processes=os.cpu_count() if args.processes <= 0 else args.processes,
+                           max_open=1 if args.first_open else max(args.max_open, 0), live_check=args.live_check,
+                           probe=args.service, probe_wait=args.probe_wait,
+                           adaptive=args.adaptive, rtt_multiplier=args.rtt_multiplier, min_wait=args.min_wait,
+                           dns_ttl=args.dns_ttl, recheck_changed=args.recheck_changed)
+    if options.probe and options.engine == 'thread':
+        LOGGER.warning('Service identification (-s) requires the async engine, ignored.')
+    if options.protocol == 'udp' and options.engine == 'thread':
+        LOGGER.warning('UDP mode (-u) requires the async engine, async engine used.')
+    if args.diff:
+        options.baseline = _Baseline(args.baseline)
+    metrics = None
+    if args.watch > 0 or args.metrics:
+        metrics = _WatchMetrics(args.metrics, options.protocol)
+        options.on_result = metrics.add
+    if args.watch > 0:
+        # Target set is read once (stdin can only be read once), the process, DNS cache and metrics persist
+        host_lines = [args.connection] if args.connection else list(_read_host_lines(args.input))
+        watch_options = _fd_limited_options(options)
+        signal.signal(signal.SIGINT, _signal_handler)
+        return _watch(lambda: _render_scan(scan(host_lines, watch_options), watch_options), args.watch, options, metrics)
+
     if args.connection:
-        ret_cd = _process_host_connection(args.connection, args.wait, args.only_open)
+        ret_cd = _process_host_connection(args.connection, options)
     else:
-        ret_cd = _process_host_file(args.input, args.wait, args.only_open)
+        ret_cd = _process_host_file(args.input, options)
+    if options.baseline is not None:
+        options.baseline.save()
+    if metrics is not None:
+        metrics.run_complete()
+        metrics.write()
 
     return ret_cd
 